@@ -0,0 +1,179 @@
+"""
+Content-addressed backup store for the SQLite database.
+
+Snapshots are streamed in fixed-size chunks through zlib. Each chunk is
+stored once under its SHA-256, so pages that did not change between
+snapshots cost nothing. A snapshot is a small JSON manifest listing its
+chunks. Old snapshots are thinned out by an hourly/daily/weekly policy,
+and chunks no manifest references any more are garbage collected.
+"""
+
+import hashlib
+import json
+import os
+import threading
+import zlib
+from datetime import datetime
+
+# Multiple of every SQLite page size, so an unchanged run of pages always
+# lands in an identical chunk
+CHUNK_SIZE = 64 * 1024
+
+class BackupStore:
+    def __init__(self, root, compression_level=6):
+        self.root = root
+        self.chunk_dir = os.path.join(root, 'chunks')
+        self.snapshot_dir = os.path.join(root, 'snapshots')
+        self.compression_level = compression_level
+        self._lock = threading.Lock()
+        os.makedirs(self.chunk_dir, exist_ok=True)
+        os.makedirs(self.snapshot_dir, exist_ok=True)
+
+    def _chunk_path(self, digest):
+        return os.path.join(self.chunk_dir, digest[:2], digest + '.z')
+
+    def _manifest_path(self, snapshot_id):
+        return os.path.join(self.snapshot_dir, snapshot_id + '.json')
+
+    @staticmethod
+    def _write_atomic(path, data):
+        """Write bytes to path via a temp file so readers never see a partial file"""
+        temp_path = path + '.tmp'
+        with open(temp_path, 'wb') as f:
+            f.write(data)
+        os.replace(temp_path, path)
+
+    def save(self, source_file, prefix='fitness_tracker'):
+        """
+        Store a snapshot of source_file, which must not change while it is read.
+
+        Returns:
+            dict: The snapshot manifest, including how many bytes were new.
+        """
+        created_at = datetime.now()
+        snapshot_id = f"{prefix}_{created_at.strftime('%Y%m%d_%H%M%S_%f')}"
+        chunks = []
+        size = 0
+        stored_bytes = 0
+        with self._lock:
+            with open(source_file, 'rb') as f:
+                while True:
+                    block = f.read(CHUNK_SIZE)
+                    if not block:
+                        break
+                    digest = hashlib.sha256(block).hexdigest()
+                    path = self._chunk_path(digest)
+                    if not os.path.exists(path):
+                        os.makedirs(os.path.dirname(path), exist_ok=True)
+                        compressed = zlib.compress(block, self.compression_level)
+                        self._write_atomic(path, compressed)
+                        stored_bytes += len(compressed)
+                    chunks.append(digest)
+                    size += len(block)
+
+            manifest = {
+                'id': snapshot_id,
+                'created_at': created_at.isoformat(),
+                'size': size,
+                'chunk_size': CHUNK_SIZE,
+                'stored_bytes': stored_bytes,
+                'chunks': chunks,
+            }
+            self._write_atomic(self._manifest_path(snapshot_id),
+                               json.dumps(manifest).encode('utf-8'))
+        return manifest
+
+    def load_manifest(self, snapshot_id):
+        with open(self._manifest_path(snapshot_id), 'r') as f:
+            return json.load(f)
+
+    def exists(self, snapshot_id):
+        return os.path.exists(self._manifest_path(snapshot_id))
+
+    def list_snapshots(self):
+        """Snapshot ids, newest first"""
+        return sorted((name[:-len('.json')] for name in os.listdir(self.snapshot_dir)
+                       if name.endswith('.json')), reverse=True)
+
+    def restore(self, snapshot_id, dest_file):
+        """Write the snapshot out to dest_file, verifying every chunk"""
+        manifest = self.load_manifest(snapshot_id)
+        temp_file = dest_file + '.tmp'
+        with open(temp_file, 'wb') as out:
+            for digest in manifest['chunks']:
+                with open(self._chunk_path(digest), 'rb') as f:
+                    block = zlib.decompress(f.read())
+                if hashlib.sha256(block).hexdigest() != digest:
+                    raise ValueError(f"Corrupt backup chunk {digest}")
+                out.write(block)
+        os.replace(temp_file, dest_file)
+        return dest_file
+
+    @staticmethod
+    def select_retained(snapshots, hourly=24, daily=7, weekly=8):
+        """
+        Pick which snapshots a grandfather-father-son policy keeps.
+
+        Args:
+            snapshots (list): (snapshot_id, datetime) pairs
+            hourly, daily, weekly (int): How many of the most recent hours,
+                days and ISO weeks keep their newest snapshot
+
+        Returns:
+            set: Snapshot ids to keep. The newest snapshot is always kept.
+        """
+        ordered = sorted(snapshots, key=lambda s: s[1], reverse=True)
+        keep = {ordered[0][0]} if ordered else set()
+        buckets = [
+            (hourly, lambda dt: (dt.date(), dt.hour)),
+            (daily, lambda dt: dt.date()),
+            (weekly, lambda dt: dt.isocalendar()[:2]),
+        ]
+        for count, bucket_of in buckets:
+            seen = set()
+            for snapshot_id, created_at in ordered:
+                bucket = bucket_of(created_at)
+                if bucket in seen:
+                    continue
+                if len(seen) >= count:
+                    break
+                seen.add(bucket)
+                keep.add(snapshot_id)
+        return keep
+
+    def apply_retention(self, hourly=24, daily=7, weekly=8):
+        """Delete snapshots outside the retention policy and their orphaned chunks"""
+        with self._lock:
+            snapshots = []
+            for snapshot_id in self.list_snapshots():
+                created_at = datetime.fromisoformat(self.load_manifest(snapshot_id)['created_at'])
+                snapshots.append((snapshot_id, created_at))
+            keep = self.select_retained(snapshots, hourly, daily, weekly)
+
+            removed = 0
+            for snapshot_id, _ in snapshots:
+                if snapshot_id not in keep:
+                    os.remove(self._manifest_path(snapshot_id))
+                    removed += 1
+            if removed:
+                self._collect_garbage()
+            return removed
+
+    def _collect_garbage(self):
+        """Remove chunks that no remaining manifest references"""
+        referenced = set()
+        for snapshot_id in self.list_snapshots():
+            referenced.update(self.load_manifest(snapshot_id)['chunks'])
+        for shard in os.listdir(self.chunk_dir):
+            shard_dir = os.path.join(self.chunk_dir, shard)
+            for name in os.listdir(shard_dir):
+                if name.endswith('.z') and name[:-len('.z')] not in referenced:
+                    os.remove(os.path.join(shard_dir, name))
+
+    def disk_usage(self):
+        """Bytes used on disk by chunks and manifests"""
+        total = 0
+        for dirpath, _, filenames in os.walk(self.root):
+            for name in filenames:
+                total += os.path.getsize(os.path.join(dirpath, name))
+        return total
@@ -0,0 +1,295 @@
+"""
+Benchmarks for the Database and the analytics built on it.
+
+Generates a synthetic multi-user dataset for each size (10k, 100k and 1M
+weight entries by default) in a scratch directory, then times every Database
+method and analytics function the pages call against it. Results are written
+as JSON; pass a previous results file with --compare to flag operations that
+got slower since then.
+
+The analytics functions are imported from streamlit_app in bare mode and
+pointed at the benchmark database, so they are timed exactly as the pages
+run them.
+
+Usage:
+    python benchmark.py [--sizes 10000,100000,1000000] [--repeat 5]
+                        [--output benchmark_results.json]
+                        [--compare previous.json] [--threshold 1.25]
+"""
+
+import argparse
+import json
+import logging
+import os
+import platform
+import shutil
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+
+import numpy as np
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+
+DEFAULT_SIZES = (10_000, 100_000, 1_000_000)
+DEFAULT_OUTPUT = 'benchmark_results.json'
+
+# Each user logs ten years of daily weigh-ins at most, so larger datasets
+# spread over more users rather than growing one history without bound
+MAX_DAYS_PER_USER = 3650
+MIN_USERS = 10
+RUN_EVERY_DAYS = 3   # One running entry every third day
+LOAD_BATCH_ROWS = 50_000
+
+# A ratio above the threshold only counts as a regression when the median
+# also grew by more than this, so sub-millisecond jitter is not reported
+NOISE_FLOOR_MS = 1.0
+
+def user_name(index):
+    return f"bench_user_{index:05d}"
+
+def generate_weights(username, days, end, rng):
+    """Yield (username, date, weight) for a slowly falling, noisy daily series"""
+    start_weight = rng.uniform(70, 110)
+    trend = np.linspace(0, -rng.uniform(0, 15), days)
+    noise = rng.normal(0, 0.4, days)
+    for offset in range(days):
+        day = end - timedelta(days=days - 1 - offset)
+        yield username, day, float(start_weight + trend[offset] + noise[offset])
+
+def generate_runs(username, days, end, rng):
+    """Yield (username, date, distance, duration, heart_rate) every few days"""
+    for offset in range(0, days, RUN_EVERY_DAYS):
+        day = end - timedelta(days=days - 1 - offset)
+        distance = float(rng.uniform(3, 15))
+        yield (username, day, round(distance, 2), int(distance * rng.uniform(300, 420)),
+               int(rng.integers(120, 175)))
+
+def batched(rows, size=LOAD_BATCH_ROWS):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+def load_dataset(database, rows, seed=0):
+    """
+    Fill database with about rows weight entries spread over several users.
+
+    Returns:
+        dict: Dataset shape and how long loading took
+    """
+    rng = np.random.default_rng(seed)
+    users = max(MIN_USERS, -(-rows // MAX_DAYS_PER_USER))
+    days = rows // users
+    end = date.today()
+
+    started = time.perf_counter()
+    for index in range(users):
+        database.add_user(user_name(index), 'benchmark')
+    for index in range(users):
+        username = user_name(index)
+        for batch in batched(generate_weights(username, days, end, rng)):
+            database.add_weight_entries(batch)
+        for batch in batched(generate_runs(username, days, end, rng)):
+            database.add_running_entries(batch)
+    load_ms = (time.perf_counter() - started) * 1000
+    return {'users': users, 'days_per_user': days, 'weight_rows': users * days,
+            'load_ms': round(load_ms, 1)}
+
+def time_call(func, repeat, setup=None):
+    """
+    Time func over repeat calls; setup(i) runs untimed before each call and
+    returns the arguments to pass.
+
+    Returns:
+        dict: min, median, mean and max milliseconds
+    """
+    timings = []
+    for i in range(repeat):
+        args = setup(i) if setup else ()
+        started = time.perf_counter()
+        func(*args)
+        timings.append((time.perf_counter() - started) * 1000)
+    return {
+        'runs': repeat,
+        'min_ms': round(min(timings), 3),
+        'median_ms': round(statistics.median(timings), 3),
+        'mean_ms': round(statistics.mean(timings), 3),
+        'max_ms': round(max(timings), 3),
+    }
+
+def import_app():
+    """Import streamlit_app in bare mode, quietly"""
+    import warnings
+    warnings.simplefilter('ignore')
+    # Bare mode warns about the missing script run context on every st call
+    logging.disable(logging.WARNING)
+    try:
+        import streamlit_app
+    finally:
+        logging.disable(logging.NOTSET)
+    return streamlit_app
+
+def benchmark_size(app, work_dir, rows, repeat):
+    """Load a dataset of rows weight entries and time every operation on it"""
+    from database import Database
+
+    database = Database(os.path.join(work_dir, f'bench_{rows}.db'),
+                        backup_dir=os.path.join(work_dir, f'backups_{rows}'))
+    # Keep the background backup thread idle while timing; the pending
+    # backup is flushed explicitly at the end
+    database.backups.quiet_period = database.backups.max_delay = 24 * 3600
+    app.db = database
+
+    try:
+        dataset = load_dataset(database, rows)
+        print(f"{rows:>9,} rows: {dataset['users']} users x {dataset['days_per_user']} days, "
+              f"loaded in {dataset['load_ms'] / 1000:.1f} s")
+
+        username = user_name(0)
+        first_day = date.today() - timedelta(days=dataset['days_per_user'])
+        goal_weight = app.load_weight_data(username)['Weight'].min() - 5
+
+        def cold(func):
+            # Analytics as the first page view after a write sees them
+            def run(*args):
+                database.cache.clear()
+                return func(*args)
+            return run
+
+        operations = [
+            ('add_weight_entry', database.add_weight_entry,
+             lambda i: (username, first_day - timedelta(days=i + 1), 80.0)),
+            ('get_weight_history', database.get_weight_history, lambda i: (username,)),
+            ('get_running_history', database.get_running_history, lambda i: (username,)),
+            ('get_weight_rollups', database.get_weight_rollups, lambda i: (username, 'week')),
+            ('get_weight_trend', database.get_weight_trend, lambda i: (username,)),
+            ('get_weekly_averages', app.get_weekly_averages, lambda i: (username,)),
+            ('calculate_trend_analysis:cold', cold(app.calculate_trend_analysis),
+             lambda i: (username,)),
+            ('calculate_trend_analysis:warm', app.calculate_trend_analysis,
+             lambda i: (username,)),
+            ('estimate_time_to_goal', app.estimate_time_to_goal,
+             lambda i: (username, goal_weight, app.load_weight_data(username))),
+            ('create_backup', database.create_backup, None),
+            # Each run clears a different user, never the one timed above
+            ('clear_user_data', database.clear_user_data,
+             lambda i: (user_name(1 + i % (dataset['users'] - 1)),)),
+        ]
+
+        results = [{'rows': rows, 'operation': 'load_dataset', 'runs': 1,
+                    **{key: dataset['load_ms'] for key in
+                       ('min_ms', 'median_ms', 'mean_ms', 'max_ms')}}]
+        for name, func, setup in operations:
+            timing = time_call(func, repeat, setup)
+            results.append({'rows': rows, 'operation': name, **timing})
+            print(f"  {name:32s} median {timing['median_ms']:10.2f} ms"
+                  f"  (min {timing['min_ms']:.2f}, max {timing['max_ms']:.2f})")
+        return dataset, results
+    finally:
+        database.backups.flush()
+        database.pool.close_all()
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=APP_DIR,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def compare(results, previous, threshold):
+    """
+    Compare median timings with a previous results file.
+
+    Returns:
+        list: (rows, operation, before_ms, after_ms) for every regression
+    """
+    before = {(r['rows'], r['operation']): r['median_ms'] for r in previous['results']}
+    regressions = []
+    print(f"\nCompared with {previous.get('commit') or 'previous run'} "
+          f"({previous.get('created', 'unknown date')}):")
+    for result in results:
+        key = (result['rows'], result['operation'])
+        if key not in before or before[key] <= 0:
+            continue
+        after_ms = result['median_ms']
+        ratio = after_ms / before[key]
+        slower = ratio > threshold and after_ms - before[key] > NOISE_FLOOR_MS
+        if slower:
+            regressions.append((*key, before[key], after_ms))
+        print(f"  {result['rows']:>9,} {result['operation']:32s} "
+              f"{before[key]:10.2f} -> {after_ms:10.2f} ms  x{ratio:.2f}"
+              + ("  REGRESSION" if slower else ""))
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sizes', default=','.join(str(size) for size in DEFAULT_SIZES),
+                        help="Comma-separated dataset sizes, in weight entries")
+    parser.add_argument('--repeat', type=int, default=5,
+                        help="Calls timed per operation; the median is compared")
+    parser.add_argument('--output', default=DEFAULT_OUTPUT,
+                        help="Where to write the JSON results")
+    parser.add_argument('--compare', metavar='PATH',
+                        help="Previous results file to check for regressions")
+    parser.add_argument('--threshold', type=float, default=1.25,
+                        help="Slowdown ratio that counts as a regression")
+    args = parser.parse_args()
+    sizes = [int(size) for size in args.sizes.split(',') if size.strip()]
+    repeat = max(1, args.repeat)
+
+    previous = None
+    if args.compare:
+        with open(args.compare) as f:
+            previous = json.load(f)
+    output = os.path.abspath(args.output)
+
+    # The app and its database live in a scratch directory, so nothing is
+    # written next to the code
+    work_dir = tempfile.mkdtemp(prefix='benchmark_')
+    cwd = os.getcwd()
+    sys.path.insert(0, APP_DIR)
+    datasets, results = {}, []
+    try:
+        os.chdir(work_dir)
+        app = import_app()
+        for rows in sizes:
+            datasets[rows], size_results = benchmark_size(app, work_dir, rows, repeat)
+            results.extend(size_results)
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    report = {
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'commit': git_commit(),
+        'python': platform.python_version(),
+        'sqlite': sqlite3.sqlite_version,
+        'platform': platform.platform(),
+        'repeat': repeat,
+        'datasets': {str(rows): shape for rows, shape in datasets.items()},
+        'results': results,
+    }
+    with open(output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"\nResults written to {output}")
+
+    if previous is None:
+        return 0
+    regressions = compare(results, previous, args.threshold)
+    for rows, operation, before_ms, after_ms in regressions:
+        print(f"FAIL: {operation} at {rows:,} rows went from {before_ms:.2f} "
+              f"to {after_ms:.2f} ms")
+    print("Benchmark comparison " + ("failed" if regressions else "passed"))
+    return 1 if regressions else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
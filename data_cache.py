@@ -0,0 +1,101 @@
+"""
+Process-wide cache of parsed per-user datasets and the figures drawn from them.
+
+Entries are keyed by (username, dataset) and tagged with the data version
+the Database reported when they were loaded. A lookup with a newer version
+is a miss, so a write never serves stale data even before the explicit
+invalidation runs. Least recently used entries are evicted once the entry
+count or the estimated memory use goes over its cap.
+"""
+
+import threading
+from collections import OrderedDict
+
+class VersionedCache:
+    def __init__(self, max_bytes=64 * 1024 * 1024, max_entries=1024):
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # key -> (version, value, size)
+        self._lock = threading.Lock()
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def _size_of(value):
+        """Estimated memory footprint in bytes"""
+        if hasattr(value, 'memory_usage'):
+            usage = value.memory_usage(deep=True)
+            return int(usage.sum()) if hasattr(usage, 'sum') else int(usage)
+        if hasattr(value, 'to_plotly_json'):
+            # Plotly figure: dominated by its trace coordinate arrays
+            return sum(getattr(axis, 'nbytes', 8 * len(axis))
+                       for trace in value.data
+                       for axis in (trace.x, trace.y) if axis is not None)
+        return 0
+
+    def _remove(self, key):
+        _, _, size = self._entries.pop(key)
+        self.current_bytes -= size
+
+    def get(self, key, version):
+        """Cached value for key at exactly this version, or None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] != version:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key, version, value):
+        size = self._size_of(value)
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            if size > self.max_bytes:
+                # Larger than the whole cache: serve it uncached
+                return
+            self._entries[key] = (version, value, size)
+            self.current_bytes += size
+            while (len(self._entries) > self.max_entries
+                   or self.current_bytes > self.max_bytes):
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.evictions += 1
+
+    def get_or_load(self, key, version, loader):
+        """
+        Return a copy of the cached value, calling loader() on a miss.
+
+        A copy is returned so callers can modify the frame freely without
+        corrupting what other pages and sessions see.
+        """
+        value = self.get(key, version)
+        if value is None:
+            value = loader()
+            self.put(key, version, value)
+        return value.copy() if hasattr(value, 'copy') else value
+
+    def invalidate(self, username):
+        """Drop every dataset cached for a user"""
+        with self._lock:
+            for key in [k for k in self._entries if k[0] == username]:
+                self._remove(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.current_bytes = 0
+
+    def stats(self):
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'bytes': self.current_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+            }
@@ -1,265 +1,1482 @@
 import sqlite3
 import pandas as pd
 from datetime import datetime
+from contextlib import contextmanager
+import csv
+import io
+import json
 import os
-import shutil
+import glob
+import queue
+import atexit
+import threading
+import time
+import re
+import functools
+import logging
+from logging.handlers import RotatingFileHandler
+from backup_store import BackupStore
+from data_cache import VersionedCache
+from timings import timed_methods, timings
 
+# synchronous pragma per durability setting. All modes use WAL journaling, so
+# readers never wait on a writer; 'normal' may lose the last commits on power
+# loss but never corrupts the database, 'off' trades that for raw throughput.
+DURABILITY_MODES = {
+    'full': 'FULL',
+    'normal': 'NORMAL',
+    'off': 'OFF',
+}
+
+# Rollup periods, as SQL for the first day of the period containing a date and
+# for the last day of a period given its first day. Weeks run Monday to Sunday.
+ROLLUP_PERIODS = {
+    'week': ("date({0}, 'weekday 0', '-6 days')", "date({0}, '+6 days')"),
+    'month': ("date({0}, 'start of month')", "date({0}, '+1 month', '-1 day')"),
+}
+
+def _rollup_migration():
+    """
+    Statements that create weight_rollups, backfill it and install the
+    triggers that keep it current.
+
+    The triggers run inside whatever transaction writes weight_entries, so the
+    rollups can never disagree with the entries. Adding a row only touches its
+    bucket's running totals. Removing one subtracts it, and re-reads the bucket
+    through the covering index only when the row was the bucket's min or max.
+    """
+    def add(row, period):
+        start_sql = ROLLUP_PERIODS[period][0].format(f'{row}.date')
+        return f'''
+        INSERT INTO weight_rollups (username, period, period_start, entry_count,
+                                    weight_sum, weight_min, weight_max, weight_sum_sq)
+        VALUES ({row}.username, '{period}', {start_sql}, 1,
+                {row}.weight, {row}.weight, {row}.weight, {row}.weight * {row}.weight)
+        ON CONFLICT(username, period, period_start) DO UPDATE SET
+            entry_count = entry_count + 1,
+            weight_sum = weight_sum + excluded.weight_sum,
+            weight_min = MIN(weight_min, excluded.weight_min),
+            weight_max = MAX(weight_max, excluded.weight_max),
+            weight_sum_sq = weight_sum_sq + excluded.weight_sum_sq;
+        '''
+
+    def remove(row, period):
+        start_sql, end_sql = ROLLUP_PERIODS[period]
+        where = (f"username = {row}.username AND period = '{period}' "
+                 f"AND period_start = {start_sql.format(f'{row}.date')}")
+        bucket = f'''FROM weight_entries
+                WHERE username = {row}.username
+                AND date BETWEEN weight_rollups.period_start
+                             AND {end_sql.format('weight_rollups.period_start')}'''
+        return f'''
+        UPDATE weight_rollups SET
+            entry_count = entry_count - 1,
+            weight_sum = weight_sum - {row}.weight,
+            weight_sum_sq = weight_sum_sq - {row}.weight * {row}.weight,
+            weight_min = CASE WHEN {row}.weight > weight_min THEN weight_min
+                              ELSE (SELECT MIN(weight) {bucket}) END,
+            weight_max = CASE WHEN {row}.weight < weight_max THEN weight_max
+                              ELSE (SELECT MAX(weight) {bucket}) END
+        WHERE {where};
+        DELETE FROM weight_rollups WHERE {where} AND entry_count <= 0;
+        '''
+
+    statements = ['''
+        CREATE TABLE IF NOT EXISTS weight_rollups (
+            username TEXT NOT NULL,
+            period TEXT NOT NULL,
+            period_start TEXT NOT NULL,
+            entry_count INTEGER NOT NULL,
+            weight_sum REAL NOT NULL,
+            weight_min REAL,
+            weight_max REAL,
+            weight_sum_sq REAL NOT NULL,
+            PRIMARY KEY (username, period, period_start)
+        ) WITHOUT ROWID
+    ''']
+    for period, (start_sql, _) in ROLLUP_PERIODS.items():
+        statements.append(f'''
+        INSERT OR REPLACE INTO weight_rollups
+        SELECT username, '{period}', {start_sql.format('date')}, COUNT(*),
+               SUM(weight), MIN(weight), MAX(weight), SUM(weight * weight)
+        FROM weight_entries GROUP BY 1, 3
+        ''')
+    triggers = {
+        'weight_rollups_insert': ('AFTER INSERT', [add('NEW', p) for p in ROLLUP_PERIODS]),
+        'weight_rollups_delete': ('AFTER DELETE', [remove('OLD', p) for p in ROLLUP_PERIODS]),
+        'weight_rollups_update': ('AFTER UPDATE OF username, date, weight',
+                                  [remove('OLD', p) for p in ROLLUP_PERIODS]
+                                  + [add('NEW', p) for p in ROLLUP_PERIODS]),
+    }
+    for name, (event, body) in triggers.items():
+        statements.append(f"CREATE TRIGGER IF NOT EXISTS {name} {event} ON weight_entries "
+                          f"BEGIN {''.join(body)} END")
+    return statements
+
+# Trend regressions use x = days since this date and y = weight in hundredths
+# of a kg. Both are integers, so the running sums are exact no matter how many
+# entries are added and removed.
+TREND_EPOCH = '2000-01-01'
+
+def _trend_migration():
+    """
+    Statements that create weight_trends, the per-user sufficient statistics
+    (n, sums of x, y, xy, x² and y²) of a least-squares fit of weight against
+    date, backfill it and install the triggers that update it in O(1) per
+    written entry.
+    """
+    def terms(date_column, weight_column):
+        x = f"CAST(julianday({date_column}) - julianday('{TREND_EPOCH}') AS INTEGER)"
+        y = f"CAST(ROUND({weight_column} * 100) AS INTEGER)"
+        return x, y
+
+    def add(row):
+        x, y = terms(f'{row}.date', f'{row}.weight')
+        return f'''
+        INSERT INTO weight_trends (username, n, sum_x, sum_y, sum_xy, sum_xx, sum_yy)
+        VALUES ({row}.username, 1, {x}, {y}, ({x}) * ({y}), ({x}) * ({x}), ({y}) * ({y}))
+        ON CONFLICT(username) DO UPDATE SET
+            n = n + 1,
+            sum_x = sum_x + excluded.sum_x,
+            sum_y = sum_y + excluded.sum_y,
+            sum_xy = sum_xy + excluded.sum_xy,
+            sum_xx = sum_xx + excluded.sum_xx,
+            sum_yy = sum_yy + excluded.sum_yy;
+        '''
+
+    def remove(row):
+        x, y = terms(f'{row}.date', f'{row}.weight')
+        return f'''
+        UPDATE weight_trends SET
+            n = n - 1,
+            sum_x = sum_x - {x},
+            sum_y = sum_y - {y},
+            sum_xy = sum_xy - ({x}) * ({y}),
+            sum_xx = sum_xx - ({x}) * ({x}),
+            sum_yy = sum_yy - ({y}) * ({y})
+        WHERE username = {row}.username;
+        DELETE FROM weight_trends WHERE username = {row}.username AND n <= 0;
+        '''
+
+    x, y = terms('date', 'weight')
+    return [
+        '''
+        CREATE TABLE IF NOT EXISTS weight_trends (
+            username TEXT PRIMARY KEY,
+            n INTEGER NOT NULL,
+            sum_x INTEGER NOT NULL,
+            sum_y INTEGER NOT NULL,
+            sum_xy INTEGER NOT NULL,
+            sum_xx INTEGER NOT NULL,
+            sum_yy INTEGER NOT NULL
+        ) WITHOUT ROWID
+        ''',
+        f'''
+        INSERT OR REPLACE INTO weight_trends
+        SELECT username, COUNT(*), SUM({x}), SUM({y}),
+               SUM(({x}) * ({y})), SUM(({x}) * ({x})), SUM(({y}) * ({y}))
+        FROM weight_entries GROUP BY username
+        ''',
+        f"CREATE TRIGGER IF NOT EXISTS weight_trends_insert AFTER INSERT ON weight_entries "
+        f"BEGIN {add('NEW')} END",
+        f"CREATE TRIGGER IF NOT EXISTS weight_trends_delete AFTER DELETE ON weight_entries "
+        f"BEGIN {remove('OLD')} END",
+        f"CREATE TRIGGER IF NOT EXISTS weight_trends_update "
+        f"AFTER UPDATE OF username, date, weight ON weight_entries "
+        f"BEGIN {remove('OLD')}{add('NEW')} END",
+    ]
+
+# String and numeric literals, which are replaced by ? to get a statement's shape
+SQL_LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+
+@functools.lru_cache(maxsize=1024)
+def normalize_sql(sql):
+    """Statement shape: literals replaced by ? and whitespace collapsed"""
+    return ' '.join(SQL_LITERALS.sub('?', sql).split())
+
+class QueryLog:
+    """Opt-in per-statement statistics and slow query log
+
+    Every statement run on an instrumented connection is recorded with its
+    shape, bind count, elapsed time (execute plus fetching its rows) and rows
+    returned, or affected for writes. Counters are kept per shape, and
+    statements slower than slow_ms are written to a rotating log file. Bind
+    values are never logged.
+    """
+
+    def __init__(self, slow_ms=100.0, log_file='slow_queries.log',
+                 max_bytes=5 * 1024 * 1024, backup_count=3):
+        self.slow_ms = slow_ms
+        self.log_file = log_file
+        self._shapes = {}  # shape -> [calls, total_ms, max_ms, rows, slow]
+        self._lock = threading.Lock()
+        # A private logger, so several Databases never share handlers
+        self._logger = logging.Logger('fittrack.slow_queries')
+        handler = RotatingFileHandler(log_file, maxBytes=max_bytes,
+                                      backupCount=backup_count, delay=True)
+        handler.setFormatter(logging.Formatter('%(asctime)s %(message)s'))
+        self._logger.addHandler(handler)
+
+    def record(self, sql, binds, elapsed_ms, rows):
+        shape = normalize_sql(sql)
+        slow = elapsed_ms >= self.slow_ms
+        with self._lock:
+            counters = self._shapes.get(shape)
+            if counters is None:
+                counters = self._shapes[shape] = [0, 0.0, 0.0, 0, 0]
+            counters[0] += 1
+            counters[1] += elapsed_ms
+            counters[2] = max(counters[2], elapsed_ms)
+            counters[3] += rows
+            counters[4] += slow
+        if slow:
+            self._logger.warning(f"{elapsed_ms:.1f} ms rows={rows} binds={binds} {shape}")
+
+    def stats(self):
+        """
+        Counters per statement shape, most total time first.
+
+        Returns:
+            pd.DataFrame: shape, calls, total_ms, mean_ms, max_ms, rows, slow
+        """
+        with self._lock:
+            rows = [{'shape': shape, 'calls': calls, 'total_ms': total_ms,
+                     'mean_ms': total_ms / calls, 'max_ms': max_ms, 'rows': row_count,
+                     'slow': slow}
+                    for shape, (calls, total_ms, max_ms, row_count, slow) in self._shapes.items()]
+        columns = ['shape', 'calls', 'total_ms', 'mean_ms', 'max_ms', 'rows', 'slow']
+        df = pd.DataFrame(rows, columns=columns)
+        return df.sort_values('total_ms', ascending=False, ignore_index=True).round(2)
+
+    def reset(self):
+        with self._lock:
+            self._shapes.clear()
+
+class LoggedCursor(sqlite3.Cursor):
+    """Cursor that reports each statement to a QueryLog
+
+    A statement with a result set is reported once its rows have been read,
+    or when the cursor moves on to the next statement or goes away.
+    """
+
+    query_log = None
+    _pending = None  # [sql, binds, elapsed_ms, rows] of an unreported read
+
+    def _finish(self):
+        if self._pending is not None:
+            self.query_log.record(*self._pending)
+            self._pending = None
+
+    def _executed(self, sql, binds, started):
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        if self.description is None:
+            # No result set: a write, reported with the rows it changed
+            self.query_log.record(sql, binds, elapsed_ms, max(self.rowcount, 0))
+        else:
+            self._pending = [sql, binds, elapsed_ms, 0]
+
+    def _fetched(self, started, rows, done):
+        if self._pending is not None:
+            self._pending[2] += (time.perf_counter() - started) * 1000
+            self._pending[3] += rows
+            if done:
+                self._finish()
+
+    def execute(self, sql, parameters=()):
+        self._finish()
+        started = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            self._executed(sql, len(parameters), started)
+
+    def executemany(self, sql, seq_of_parameters):
+        self._finish()
+        binds = 0
+        def counted():
+            nonlocal binds
+            for parameters in seq_of_parameters:
+                binds += len(parameters)
+                yield parameters
+        started = time.perf_counter()
+        try:
+            return super().executemany(sql, counted())
+        finally:
+            self._executed(sql, binds, started)
+
+    def fetchone(self):
+        started = time.perf_counter()
+        row = super().fetchone()
+        self._fetched(started, row is not None, row is None)
+        return row
+
+    def fetchmany(self, size=None):
+        started = time.perf_counter()
+        size = self.arraysize if size is None else size
+        rows = super().fetchmany(size)
+        self._fetched(started, len(rows), len(rows) < size)
+        return rows
+
+    def fetchall(self):
+        started = time.perf_counter()
+        rows = super().fetchall()
+        self._fetched(started, len(rows), True)
+        return rows
+
+    def __next__(self):
+        started = time.perf_counter()
+        try:
+            row = super().__next__()
+        except StopIteration:
+            self._fetched(started, 0, True)
+            raise
+        self._fetched(started, 1, False)
+        return row
+
+    def close(self):
+        self._finish()
+        super().close()
+
+    def __del__(self):
+        self._finish()
+
+class LoggedConnection(sqlite3.Connection):
+    """Connection whose cursors, including execute() shortcuts, report to query_log"""
+
+    query_log = None
+
+    def cursor(self, factory=LoggedCursor):
+        cursor = super().cursor(factory)
+        cursor.query_log = self.query_log
+        return cursor
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+class ConnectionPool:
+    """Thread-safe pool of tuned SQLite connections"""
+
+    def __init__(self, db_file, size=8, durability='normal',
+                 cache_size_kb=16384, mmap_size=256 * 1024 * 1024):
+        if durability not in DURABILITY_MODES:
+            raise ValueError(f"Unknown durability mode: {durability}")
+        self.db_file = db_file
+        self.durability = durability
+        self.cache_size_kb = cache_size_kb
+        self.mmap_size = mmap_size
+        # Optional sqlite3 trace callback installed on new connections
+        self.trace_callback = None
+        # Optional QueryLog that new connections report every statement to
+        self.query_log = None
+        self._idle = queue.LifoQueue(maxsize=size)
+
+    def _connect(self):
+        """Open a new connection with the pool's pragmas applied"""
+        if self.query_log:
+            conn = sqlite3.connect(self.db_file, timeout=30, check_same_thread=False,
+                                   factory=LoggedConnection)
+            conn.query_log = self.query_log
+        else:
+            conn = sqlite3.connect(self.db_file, timeout=30, check_same_thread=False)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute(f'PRAGMA synchronous={DURABILITY_MODES[self.durability]}')
+        # Negative cache_size is in KiB rather than pages
+        conn.execute(f'PRAGMA cache_size=-{int(self.cache_size_kb)}')
+        conn.execute(f'PRAGMA mmap_size={int(self.mmap_size)}')
+        conn.execute('PRAGMA temp_store=MEMORY')
+        if self.trace_callback:
+            conn.set_trace_callback(self.trace_callback)
+        return conn
+
+    @contextmanager
+    def connection(self):
+        """Borrow a connection, returning it to the pool afterwards"""
+        try:
+            conn = self._idle.get_nowait()
+        except queue.Empty:
+            conn = self._connect()
+        try:
+            yield conn
+        finally:
+            if conn.in_transaction:
+                conn.rollback()
+            try:
+                self._idle.put_nowait(conn)
+            except queue.Full:
+                conn.close()
+
+    def close_all(self):
+        """Close every idle connection"""
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                break
+
+class BackupScheduler:
+    """Coalesces bursts of writes into a single background snapshot
+
+    Writers only call notify(). A daemon thread takes the backup once writes
+    have been quiet for quiet_period seconds, or at the latest max_delay
+    seconds after the first unsaved write, so a steady stream of writes still
+    gets snapshotted.
+    """
+
+    def __init__(self, database, quiet_period=30, max_delay=300):
+        self.database = database
+        self.quiet_period = quiet_period
+        self.max_delay = max_delay
+        self._lock = threading.Lock()
+        self._backup_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._first_dirty = None
+        self._last_dirty = None
+        self._thread = None
+
+    def notify(self):
+        """Record that the database changed; never waits on backup I/O"""
+        now = time.monotonic()
+        with self._lock:
+            if self._first_dirty is None:
+                self._first_dirty = now
+            self._last_dirty = now
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='backup-scheduler',
+                                                daemon=True)
+                self._thread.start()
+                atexit.register(self.flush)
+        self._wakeup.set()
+
+    def pending(self):
+        """Whether there are writes not yet captured by a backup"""
+        with self._lock:
+            return self._first_dirty is not None
+
+    def _due_in(self):
+        """Seconds until the pending backup is due, or None if nothing is pending"""
+        with self._lock:
+            if self._first_dirty is None:
+                return None
+            due = min(self._last_dirty + self.quiet_period,
+                      self._first_dirty + self.max_delay)
+            return max(0.0, due - time.monotonic())
+
+    def _run(self):
+        while True:
+            due = self._due_in()
+            if due is None or due > 0:
+                self._wakeup.wait(due)
+                self._wakeup.clear()
+                continue
+            self.flush()
+
+    def flush(self):
+        """Take the pending backup now, if any"""
+        with self._backup_lock:
+            with self._lock:
+                if self._first_dirty is None:
+                    return False
+                self._first_dirty = self._last_dirty = None
+            if self.database.create_backup():
+                self.database.cleanup_old_backups()
+                return True
+            # The writes are still unsaved: keep them pending and retry once
+            # quiet_period has passed, rather than straight away
+            now = time.monotonic()
+            with self._lock:
+                if self._first_dirty is None:
+                    self._first_dirty = self._last_dirty = now
+            return False
+
+# Every call is timed into the shared timing log, except the helpers other
+# methods call on each query
+@timed_methods('query', exclude=('connection', 'data_version', 'record_write'))
 class Database:
-    def __init__(self):
-        self.db_file = 'fitness_tracker.db'
-        self.backup_dir = 'backups'
-        self.init_db()
+    # Legacy flat-file layout used before everything moved into SQLite
+    LEGACY_WEIGHT_PATTERN = 'weight_data_*.csv'
+    LEGACY_GOAL_PATTERN = 'goal_weight_*.txt'
+    LEGACY_HEIGHT_PATTERN = 'height_*.txt'
+    LEGACY_USERS_FILE = 'users.csv'
+
+    # Upserts update the existing row in place rather than INSERT OR REPLACE,
+    # which deletes and re-inserts it (new rowid, every index touched twice).
+    # Writing an unchanged weight is a no-op.
+    WEIGHT_UPSERT_SQL = '''
+    INSERT INTO weight_entries (username, date, weight)
+    VALUES (?, ?, ?)
+    ON CONFLICT(username, date) DO UPDATE SET weight = excluded.weight
+    WHERE weight IS NOT excluded.weight
+    '''
+    HEIGHT_UPSERT_SQL = '''
+    INSERT INTO profiles (username, height)
+    VALUES (?, ?)
+    ON CONFLICT(username) DO UPDATE SET height = excluded.height
+    '''
+
+    # Tables that can be exported, with their columns. Credentials are never
+    # exported, neither here nor by export_database. Rows come out in (username, date) order straight from the
+    # covering indexes, so no sort step is needed.
+    EXPORT_TABLES = {
+        'weight_entries': ['username', 'date', 'weight'],
+        'running_entries': ['username', 'date', 'distance', 'duration', 'heart_rate'],
+        'goals': ['username', 'target_weight', 'target_date'],
+        'profiles': ['username', 'height'],
+    }
+    EXPORT_FORMATS = ('csv', 'jsonl', 'parquet')
+    # Parquet type of every export column. The schema is fixed up front
+    # rather than inferred from the first chunk, where a nullable column may
+    # be all NULL or an integer that later chunks store as a float.
+    EXPORT_COLUMN_TYPES = {
+        'username': 'string', 'date': 'string', 'weight': 'float64',
+        'distance': 'float64', 'duration': 'int64', 'heart_rate': 'int64',
+        'target_weight': 'float64', 'target_date': 'string', 'height': 'float64',
+    }
+
+    # Per-row outcomes reported by the batch write methods
+    ROW_WRITTEN = 'written'
+    ROW_UNCHANGED = 'unchanged'
+    ROW_INVALID = 'invalid'
+
+    # Schema migrations as (version, statements), applied in order to any
+    # database whose PRAGMA user_version is lower
+    SCHEMA_MIGRATIONS = [
+        (1, [
+            # Covering indexes for the per-user, date-ordered reads, so history
+            # queries never touch the table rows
+            '''CREATE INDEX IF NOT EXISTS idx_weight_entries_user_date
+               ON weight_entries (username, date, weight)''',
+            '''CREATE INDEX IF NOT EXISTS idx_running_entries_user_date
+               ON running_entries (username, date, distance, duration, heart_rate)''',
+        ]),
+        # Per-user weekly and monthly weight rollups
+        (2, _rollup_migration()),
+        # Running least-squares statistics for the weight trend
+        (3, _trend_migration()),
+    ]
+
+    def __init__(self, db_file='fitness_tracker.db', durability=None, pool_size=8,
+                 backup_dir='backups', slow_query_ms=None):
+        self.db_file = db_file
+        self.backup_dir = backup_dir
         self.ensure_backup_dir()
+        self.backup_store = BackupStore(self.backup_dir)
+        # FITTRACK_DB_DURABILITY picks 'full', 'normal' (default) or 'off'
+        durability = durability or os.environ.get('FITTRACK_DB_DURABILITY', 'normal')
+        self.pool = ConnectionPool(db_file, size=pool_size, durability=durability)
+        # Statement statistics and the slow query log are opt-in: pass
+        # slow_query_ms or set FITTRACK_SLOW_QUERY_MS (and optionally
+        # FITTRACK_SLOW_QUERY_LOG for the log file)
+        if slow_query_ms is None and os.environ.get('FITTRACK_SLOW_QUERY_MS'):
+            slow_query_ms = float(os.environ['FITTRACK_SLOW_QUERY_MS'])
+        self.query_log = None
+        if slow_query_ms is not None:
+            self.query_log = QueryLog(slow_query_ms, os.environ.get('FITTRACK_SLOW_QUERY_LOG',
+                                                                    'slow_queries.log'))
+            self.pool.query_log = self.query_log
+        self.backups = BackupScheduler(self)
+        # Per-user change counters, plus an epoch for whole-database changes
+        # such as restores. Readers use them to key cached datasets.
+        self.cache = VersionedCache()
+        self._data_versions = {}
+        self._data_epoch = 0
+        self._version_lock = threading.Lock()
+        self.init_db()
 
     def ensure_backup_dir(self):
         """Ensure backup directory exists"""
         if not os.path.exists(self.backup_dir):
             os.makedirs(self.backup_dir)
 
+    def snapshot_to_file(self, dest_file):
+        """Write a consistent copy of the live database to dest_file"""
+        # Online backup API: a plain file copy would miss pages still in the
+        # WAL. Copying in steps lets writers commit between them.
+        dest = sqlite3.connect(dest_file)
+        try:
+            with self.connection() as conn:
+                conn.backup(dest, pages=1024)
+        finally:
+            dest.close()
+        return dest_file
+
+    def export_database(self, dest_file):
+        """Write a copy of the live database to dest_file without any accounts or credentials"""
+        self.snapshot_to_file(dest_file)
+        conn = sqlite3.connect(dest_file)
+        try:
+            # A single self-contained file for download
+            conn.execute('PRAGMA journal_mode = DELETE')
+            conn.execute('PRAGMA secure_delete = ON')
+            conn.execute('DELETE FROM users')
+            conn.commit()
+            # Not every SQLite build zeroes deleted rows, so also rebuild the
+            # file rather than leave them in free pages
+            conn.execute('VACUUM')
+        finally:
+            conn.close()
+        return dest_file
+
     def create_backup(self):
-        """Create a backup of the database file"""
+        """Snapshot the database into the compressed, deduplicated backup store"""
+        temp_file = os.path.join(self.backup_dir, f'snapshot_{threading.get_ident()}.db.tmp')
         try:
-            timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-            backup_file = os.path.join(self.backup_dir, f'fitness_tracker_{timestamp}.db')
-            shutil.copy2(self.db_file, backup_file)
+            with timings.timer('backup', 'snapshot'):
+                self.snapshot_to_file(temp_file)
+            with timings.timer('backup', 'store'):
+                self.backup_store.save(temp_file)
             return True
         except Exception as e:
             print(f"Error creating backup: {e}")
             return False
+        finally:
+            if os.path.exists(temp_file):
+                os.remove(temp_file)
 
-    def restore_backup(self, backup_file):
-        """Restore database from a backup file"""
+    def restore_backup(self, backup_name):
+        """Restore database from a backup store snapshot or a legacy .db file"""
+        temp_file = None
         try:
+            if self.backup_store.exists(backup_name):
+                temp_file = os.path.join(self.backup_dir, f'restore_{threading.get_ident()}.db.tmp')
+                backup_file = self.backup_store.restore(backup_name, temp_file)
+            elif os.path.exists(backup_name):
+                backup_file = backup_name
+            else:
+                backup_file = os.path.join(self.backup_dir, backup_name)
+                if not os.path.exists(backup_file):
+                    raise FileNotFoundError(backup_name)
+
             # Create backup of current state before restoring
             self.create_backup()
             
-            # Verify backup file is valid before restoring
-            test_conn = sqlite3.connect(backup_file)
-            test_conn.close()
-            
-            shutil.copy2(backup_file, self.db_file)
+            # Copy pages from the backup into the live database so pooled
+            # connections see the restored data straight away
+            source = sqlite3.connect(backup_file)
+            try:
+                source.execute('PRAGMA quick_check')
+                with self.connection() as conn:
+                    source.backup(conn)
+                    # Backups taken before a migration need it applied again
+                    self.migrate_schema(conn)
+            finally:
+                source.close()
+            self.record_write()
             return True
         except Exception as e:
             print(f"Error restoring backup: {e}")
             return False
+        finally:
+            if temp_file and os.path.exists(temp_file):
+                os.remove(temp_file)
 
     def get_backup_files(self):
-        """Get list of available backup files"""
+        """Get list of available backups, newest first"""
         if not os.path.exists(self.backup_dir):
             return []
-        return sorted([f for f in os.listdir(self.backup_dir) if f.endswith('.db')], reverse=True)
-
-    def cleanup_old_backups(self, max_backups=5):
-        """Keep only the most recent backups"""
-        backup_files = self.get_backup_files()
-        if len(backup_files) > max_backups:
-            for old_file in backup_files[max_backups:]:
-                try:
-                    os.remove(os.path.join(self.backup_dir, old_file))
-                except Exception as e:
-                    print(f"Error cleaning up old backup: {e}")
+        legacy_files = [f for f in os.listdir(self.backup_dir) if f.endswith('.db')]
+        return sorted(self.backup_store.list_snapshots() + legacy_files, reverse=True)
+
+    def cleanup_old_backups(self, hourly=24, daily=7, weekly=8):
+        """Thin out old snapshots: newest per hour, day and ISO week"""
+        try:
+            return self.backup_store.apply_retention(hourly, daily, weekly)
+        except Exception as e:
+            print(f"Error cleaning up old backups: {e}")
+            return 0
+
+    def connection(self):
+        """Borrow a pooled connection; use as a context manager"""
+        return self.pool.connection()
+
+    def data_version(self, username):
+        """Version of a user's data; changes on every write that touches it"""
+        with self._version_lock:
+            return (self._data_epoch, self._data_versions.get(username, 0))
+
+    def record_write(self, username=None):
+        """
+        Called after every committed write. Bumps the user's data version,
+        or the epoch when username is None, drops their cached datasets and
+        schedules a backup.
+        """
+        with self._version_lock:
+            if username is None:
+                self._data_epoch += 1
+            else:
+                self._data_versions[username] = self._data_versions.get(username, 0) + 1
+        if username is None:
+            self.cache.clear()
+        else:
+            self.cache.invalidate(username)
+        self.backups.notify()
 
     def init_db(self):
         """Initialize the database with required tables"""
-        conn = sqlite3.connect(self.db_file)
-        cursor = conn.cursor()
+        with self.connection() as conn:
+            cursor = conn.cursor()
 
-        # Create users table
-        cursor.execute('''
-        CREATE TABLE IF NOT EXISTS users (
-            username TEXT PRIMARY KEY,
-            password TEXT NOT NULL,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-        ''')
+            # Create users table
+            cursor.execute('''
+            CREATE TABLE IF NOT EXISTS users (
+                username TEXT PRIMARY KEY,
+                password TEXT NOT NULL,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+            ''')
 
-        # Create weight_entries table
-        cursor.execute('''
-        CREATE TABLE IF NOT EXISTS weight_entries (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            username TEXT,
-            date DATE,
-            weight REAL,
-            FOREIGN KEY (username) REFERENCES users(username),
-            UNIQUE(username, date)
-        )
-        ''')
+            # Create weight_entries table
+            cursor.execute('''
+            CREATE TABLE IF NOT EXISTS weight_entries (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                username TEXT,
+                date DATE,
+                weight REAL,
+                FOREIGN KEY (username) REFERENCES users(username),
+                UNIQUE(username, date)
+            )
+            ''')
 
-        # Create goals table
-        cursor.execute('''
-        CREATE TABLE IF NOT EXISTS goals (
-            username TEXT PRIMARY KEY,
-            target_weight REAL,
-            target_date DATE,
-            FOREIGN KEY (username) REFERENCES users(username)
-        )
-        ''')
+            # Create goals table
+            cursor.execute('''
+            CREATE TABLE IF NOT EXISTS goals (
+                username TEXT PRIMARY KEY,
+                target_weight REAL,
+                target_date DATE,
+                FOREIGN KEY (username) REFERENCES users(username)
+            )
+            ''')
 
-        # Create running_entries table
-        cursor.execute('''
-        CREATE TABLE IF NOT EXISTS running_entries (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            username TEXT,
-            date DATE,
-            distance REAL,
-            duration INTEGER,
-            heart_rate INTEGER,
-            FOREIGN KEY (username) REFERENCES users(username)
-        )
-        ''')
+            # Create running_entries table
+            cursor.execute('''
+            CREATE TABLE IF NOT EXISTS running_entries (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                username TEXT,
+                date DATE,
+                distance REAL,
+                duration INTEGER,
+                heart_rate INTEGER,
+                FOREIGN KEY (username) REFERENCES users(username)
+            )
+            ''')
+
+            # Create profiles table
+            cursor.execute('''
+            CREATE TABLE IF NOT EXISTS profiles (
+                username TEXT PRIMARY KEY,
+                height REAL,
+                FOREIGN KEY (username) REFERENCES users(username)
+            )
+            ''')
+
+            conn.commit()
+            self.migrate_schema(conn)
 
-        conn.commit()
-        conn.close()
+    def migrate_schema(self, conn):
+        """Apply pending SCHEMA_MIGRATIONS, each in its own transaction"""
+        version = conn.execute('PRAGMA user_version').fetchone()[0]
+        applied = False
+        for target_version, statements in self.SCHEMA_MIGRATIONS:
+            if target_version <= version:
+                continue
+            conn.execute('BEGIN')
+            for statement in statements:
+                conn.execute(statement)
+            conn.execute(f'PRAGMA user_version = {int(target_version)}')
+            conn.commit()
+            applied = True
+        if applied:
+            # Refresh planner statistics for the new indexes
+            conn.execute('ANALYZE')
+            conn.commit()
+
+    @staticmethod
+    def format_date(date):
+        """Normalize a date, datetime or date string to YYYY-MM-DD"""
+        if hasattr(date, 'strftime'):
+            return date.strftime('%Y-%m-%d')
+        try:
+            # Fast path for ISO dates, which is what every writer sends
+            return datetime.strptime(date[:10], '%Y-%m-%d').strftime('%Y-%m-%d')
+        except (TypeError, ValueError):
+            return pd.to_datetime(date).strftime('%Y-%m-%d')
+
+    def migrate_legacy_files(self, data_dir='.'):
+        """Import users.csv and per-user CSV/TXT files into the database, once
+
+        Every migrated file is renamed with a .migrated suffix so it is not
+        picked up again on the next run.
+        """
+        migrated = 0
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            try:
+                path = os.path.join(data_dir, self.LEGACY_USERS_FILE)
+                if os.path.exists(path):
+                    with timings.timer('csv', self.LEGACY_USERS_FILE):
+                        df = pd.read_csv(path, dtype=str)
+                    df = df.dropna(subset=['Username', 'Password'])
+                    rows = [(u.strip(), pw.strip())
+                            for u, pw in zip(df['Username'], df['Password'])]
+                    # Accounts already in the database win over the CSV copy
+                    cursor.executemany('''
+                    INSERT INTO users (username, password) VALUES (?, ?)
+                    ON CONFLICT(username) DO NOTHING
+                    ''', rows)
+                    conn.commit()
+                    os.rename(path, path + '.migrated')
+                    migrated += 1
+
+                for path in glob.glob(os.path.join(data_dir, self.LEGACY_WEIGHT_PATTERN)):
+                    username = os.path.basename(path)[len('weight_data_'):-len('.csv')]
+                    with timings.timer('csv', self.LEGACY_WEIGHT_PATTERN):
+                        df = pd.read_csv(path)
+                    if not df.empty:
+                        df = df.dropna(subset=['Date', 'Weight'])
+                        dates = pd.to_datetime(df['Date']).dt.strftime('%Y-%m-%d')
+                        rows = [(username, d, round(float(w), 2))
+                                for d, w in zip(dates, df['Weight'])]
+                        cursor.executemany(self.WEIGHT_UPSERT_SQL, rows)
+                    conn.commit()
+                    os.rename(path, path + '.migrated')
+                    migrated += 1
+
+                for path in glob.glob(os.path.join(data_dir, self.LEGACY_GOAL_PATTERN)):
+                    username = os.path.basename(path)[len('goal_weight_'):-len('.txt')]
+                    with open(path, 'r') as f:
+                        target_weight = float(f.read().strip())
+                    cursor.execute('''
+                    INSERT INTO goals (username, target_weight, target_date)
+                    VALUES (?, ?, NULL)
+                    ON CONFLICT(username) DO UPDATE SET target_weight = excluded.target_weight
+                    ''', (username, target_weight))
+                    conn.commit()
+                    os.rename(path, path + '.migrated')
+                    migrated += 1
+
+                for path in glob.glob(os.path.join(data_dir, self.LEGACY_HEIGHT_PATTERN)):
+                    username = os.path.basename(path)[len('height_'):-len('.txt')]
+                    with open(path, 'r') as f:
+                        height = float(f.read().strip())
+                    cursor.execute(self.HEIGHT_UPSERT_SQL, (username, height))
+                    conn.commit()
+                    os.rename(path, path + '.migrated')
+                    migrated += 1
+            except Exception as e:
+                print(f"Error migrating legacy files: {e}")
+        if migrated:
+            self.record_write()
+        return migrated
 
     def add_user(self, username, password):
         """Add a new user to the database"""
-        conn = sqlite3.connect(self.db_file)
-        cursor = conn.cursor()
-        try:
-            cursor.execute('INSERT INTO users (username, password) VALUES (?, ?)',
-                         (username, password))
-            conn.commit()
-            return True
-        except sqlite3.IntegrityError:
-            return False
-        finally:
-            conn.close()
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            try:
+                cursor.execute('INSERT INTO users (username, password) VALUES (?, ?)',
+                             (username, password))
+                conn.commit()
+                self.record_write(username)
+                return True
+            except sqlite3.IntegrityError:
+                return False
 
     def verify_user(self, username, password):
         """Verify user credentials"""
-        conn = sqlite3.connect(self.db_file)
-        cursor = conn.cursor()
-        cursor.execute('SELECT password FROM users WHERE username = ?', (username,))
-        result = cursor.fetchone()
-        conn.close()
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('SELECT password FROM users WHERE username = ?', (username,))
+            result = cursor.fetchone()
         return result and result[0] == password
 
+    def user_exists(self, username):
+        """Check whether an account exists"""
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('SELECT 1 FROM users WHERE username = ?', (username,))
+            return cursor.fetchone() is not None
+
+    def update_password(self, username, new_password):
+        """Change a user's password"""
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            try:
+                cursor.execute('UPDATE users SET password = ? WHERE username = ?',
+                               (new_password, username))
+                conn.commit()
+                if cursor.rowcount != 1:
+                    return False
+                self.record_write(username)
+                return True
+            except Exception as e:
+                print(f"Error updating password: {e}")
+                return False
+
     def add_weight_entry(self, username, date, weight):
         """Add a new weight entry"""
-        conn = sqlite3.connect(self.db_file)
-        cursor = conn.cursor()
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            try:
+                cursor.execute(self.WEIGHT_UPSERT_SQL,
+                               (username, self.format_date(date), round(weight, 2)))
+                conn.commit()
+                self.record_write(username)
+                return True
+            except Exception as e:
+                print(f"Error adding weight entry: {e}")
+                return False
+
+    def add_weight_entries(self, entries):
+        """
+        Upsert many weight entries in a single transaction.
+
+        Args:
+            entries: Iterable of (username, date, weight) tuples or dicts
+                     with those keys
+
+        Returns:
+            list: One of ROW_WRITTEN, ROW_UNCHANGED or ROW_INVALID per entry,
+                  in input order, or None if the batch was rolled back
+        """
+        outcomes = []
+        changed_users = set()
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            try:
+                for entry in entries:
+                    try:
+                        if isinstance(entry, dict):
+                            entry = (entry['username'], entry['date'], entry['weight'])
+                        username, date, weight = entry
+                        # Same SQL text every row, so sqlite3 reuses the
+                        # prepared statement from its cache
+                        cursor.execute(self.WEIGHT_UPSERT_SQL,
+                                       (username, self.format_date(date), round(float(weight), 2)))
+                    except (ValueError, TypeError, KeyError, sqlite3.IntegrityError):
+                        outcomes.append(self.ROW_INVALID)
+                        continue
+                    if cursor.rowcount:
+                        outcomes.append(self.ROW_WRITTEN)
+                        changed_users.add(username)
+                    else:
+                        outcomes.append(self.ROW_UNCHANGED)
+                conn.commit()
+                for username in changed_users:
+                    self.record_write(username)
+                return outcomes
+            except Exception as e:
+                print(f"Error adding weight entries: {e}")
+                return None
+
+    def import_weight_csv(self, username, source, chunksize=10000, progress_callback=None,
+                          min_weight=30.0, max_weight=200.0):
+        """
+        Bulk-load Date,Weight rows (templates/weight_import_template.csv format).
+
+        The file is read in chunks and validated vectorized. Invalid dates or
+        weights outside [min_weight, max_weight] are skipped. Valid rows are
+        upserted by (username, date) with executemany, all in one transaction.
+        If a date appears more than once, the last row wins.
+
+        Args:
+            source: Path or file-like object with a CSV
+            progress_callback: Optional callable(rows_read, rows_imported)
+
+        Returns:
+            dict: {'imported': int, 'skipped': int}, or None if the import failed
+        """
+        imported = 0
+        skipped = 0
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            try:
+                reader = pd.read_csv(source, usecols=['Date', 'Weight'], dtype=str,
+                                     chunksize=chunksize)
+                for chunk in timings.iterate('csv', 'weight import chunk', reader):
+                    dates = pd.to_datetime(chunk['Date'].str.strip(), format='%Y-%m-%d',
+                                           errors='coerce')
+                    weights = pd.to_numeric(chunk['Weight'].str.strip(), errors='coerce').round(2)
+                    valid = dates.notna() & weights.between(min_weight, max_weight)
+                    rows = list(zip([username] * int(valid.sum()),
+                                    dates[valid].dt.strftime('%Y-%m-%d'),
+                                    weights[valid].astype(float)))
+                    cursor.executemany(self.WEIGHT_UPSERT_SQL, rows)
+                    imported += len(rows)
+                    skipped += len(chunk) - len(rows)
+                    if progress_callback:
+                        progress_callback(imported + skipped, imported)
+                conn.commit()
+                # A file with no valid rows changed nothing
+                if imported:
+                    self.record_write(username)
+                return {'imported': imported, 'skipped': skipped}
+            except Exception as e:
+                print(f"Error importing weight data: {e}")
+                return None
+
+    def iter_export_rows(self, table, username=None, chunk_rows=5000):
+        """
+        Yield rows of an export table in chunks straight from a SQL cursor.
+
+        Args:
+            table (str): One of EXPORT_TABLES
+            username (str): Only this user's rows; None exports every user
+
+        Yields:
+            list: Up to chunk_rows tuples in EXPORT_TABLES[table] column order
+        """
+        query, params = self.export_query(table, username)
+        with self.connection() as conn:
+            cursor = conn.execute(query, params)
+            while True:
+                rows = cursor.fetchmany(chunk_rows)
+                if not rows:
+                    break
+                yield rows
+
+    @classmethod
+    def export_query(cls, table, username=None):
+        """SQL and parameters that read an export table in export order"""
+        if table not in cls.EXPORT_TABLES:
+            raise ValueError(f"Unknown export table: {table}")
+        columns = cls.EXPORT_TABLES[table]
+        order = 'username, date' if 'date' in columns else 'username'
+        query = f'SELECT {", ".join(columns)} FROM {table}'
+        params = ()
+        if username is not None:
+            query += ' WHERE username = ?'
+            params = (username,)
+        query += f' ORDER BY {order}'
+        return query, params
+
+    def iter_export(self, table, fmt='csv', username=None, chunk_rows=5000):
+        """Yield an export as encoded byte chunks (csv or jsonl)"""
+        chunks = self.iter_export_rows(table, username, chunk_rows)
+        return self._encode_chunks(self.EXPORT_TABLES[table], chunks, fmt)
+
+    @staticmethod
+    def _encode_chunks(columns, chunks, fmt):
+        """Encode row chunks as csv or jsonl bytes, one block per chunk"""
+        if fmt == 'csv':
+            buffer = io.StringIO()
+            writer = csv.writer(buffer)
+            writer.writerow(columns)
+            for rows in chunks:
+                writer.writerows(rows)
+                yield buffer.getvalue().encode('utf-8')
+                buffer.seek(0)
+                buffer.truncate()
+            if buffer.tell():
+                yield buffer.getvalue().encode('utf-8')
+        elif fmt == 'jsonl':
+            for rows in chunks:
+                yield ''.join(json.dumps(dict(zip(columns, row))) + '\n'
+                              for row in rows).encode('utf-8')
+        else:
+            raise ValueError(f"Format {fmt} cannot be streamed as bytes")
+
+    def export_data(self, dest, table='weight_entries', fmt='csv', username=None,
+                    chunk_rows=5000):
+        """
+        Stream one table to a path or binary file object without loading it
+        into memory.
+
+        Parquet writes one row group per chunk and needs pyarrow.
+
+        Returns:
+            int: Number of rows written, or None if the export failed
+        """
         try:
-            # Create backup before modification
-            self.create_backup()
-            
-            cursor.execute('''
-            INSERT OR REPLACE INTO weight_entries (username, date, weight)
-            VALUES (?, ?, ?)
-            ''', (username, date, weight))
-            conn.commit()
-            return True
+            if table not in self.EXPORT_TABLES:
+                raise ValueError(f"Unknown export table: {table}")
+            if fmt not in self.EXPORT_FORMATS:
+                raise ValueError(f"Unknown export format: {fmt}")
+            columns = self.EXPORT_TABLES.get(table)
+            written = 0
+            if fmt == 'parquet':
+                import pyarrow as pa
+                import pyarrow.parquet as pq
+
+                schema = pa.schema([(c, self.EXPORT_COLUMN_TYPES[c]) for c in columns])
+                # With no rows this still writes a valid file with the schema
+                with pq.ParquetWriter(dest, schema) as writer:
+                    for rows in self.iter_export_rows(table, username, chunk_rows):
+                        arrays = [pa.array(values, type=field.type)
+                                  for values, field in zip(zip(*rows), schema)]
+                        writer.write_table(pa.Table.from_arrays(arrays, schema=schema))
+                        written += len(rows)
+                return written
+
+            def counted(chunks):
+                nonlocal written
+                for rows in chunks:
+                    written += len(rows)
+                    yield rows
+
+            out = open(dest, 'wb') if isinstance(dest, (str, os.PathLike)) else dest
+            try:
+                chunks = counted(self.iter_export_rows(table, username, chunk_rows))
+                for block in self._encode_chunks(columns, chunks, fmt):
+                    out.write(block)
+            finally:
+                if out is not dest:
+                    out.close()
+            return written
         except Exception as e:
-            print(f"Error adding weight entry: {e}")
-            return False
-        finally:
-            conn.close()
+            print(f"Error exporting {table}: {e}")
+            return None
 
     def get_weight_history(self, username):
         """Get weight history for a user"""
-        conn = sqlite3.connect(self.db_file)
         query = '''
         SELECT date, weight 
         FROM weight_entries 
         WHERE username = ? 
         ORDER BY date
         '''
-        df = pd.read_sql_query(query, conn, params=(username,))
-        conn.close()
+        with self.connection() as conn:
+            return pd.read_sql_query(query, conn, params=(username,))
+
+    def get_weight_rollups(self, username, period='week', start=None, end=None):
+        """
+        Per-week or per-month weight statistics, read from the rollup table.
+
+        Args:
+            period (str): 'week' (Monday to Sunday) or 'month'
+            start, end (date or str, optional): Only periods whose first day
+                falls in this inclusive range
+
+        Returns:
+            pd.DataFrame: period_start, count, mean, min, max and std
+                          (population) per period, oldest first
+        """
+        if period not in ROLLUP_PERIODS:
+            raise ValueError(f"Unknown rollup period: {period}")
+        query = '''
+        SELECT period_start, entry_count AS count,
+               weight_sum / entry_count AS mean,
+               weight_min AS min, weight_max AS max,
+               weight_sum_sq / entry_count - (weight_sum / entry_count) * (weight_sum / entry_count) AS variance
+        FROM weight_rollups
+        WHERE username = ? AND period = ? AND period_start BETWEEN ? AND ?
+        ORDER BY period_start
+        '''
+        params = (username, period,
+                  self.format_date(start) if start is not None else '',
+                  self.format_date(end) if end is not None else '9999-12-31')
+        with self.connection() as conn:
+            df = pd.read_sql_query(query, conn, params=params)
+        # Rounding can leave a tiny negative variance for constant weights
+        df['std'] = df.pop('variance').clip(lower=0) ** 0.5
         return df
 
-    def set_goal(self, username, target_weight, target_date):
-        """Set or update user's goal"""
-        conn = sqlite3.connect(self.db_file)
-        cursor = conn.cursor()
-        try:
+    def get_weight_trend(self, username):
+        """
+        Least-squares trend of weight against date, from the running sums.
+
+        Returns:
+            dict: n, daily_change (slope in kg/day), intercept (kg at
+                  TREND_EPOCH) and r_squared, or None without any entries.
+        """
+        with self.connection() as conn:
+            cursor = conn.cursor()
             cursor.execute('''
-            INSERT OR REPLACE INTO goals (username, target_weight, target_date)
-            VALUES (?, ?, ?)
-            ''', (username, target_weight, target_date))
-            conn.commit()
-            return True
-        except Exception as e:
-            print(f"Error setting goal: {e}")
-            return False
-        finally:
-            conn.close()
+            SELECT n, sum_x, sum_y, sum_xy, sum_xx, sum_yy
+            FROM weight_trends
+            WHERE username = ?
+            ''', (username,))
+            result = cursor.fetchone()
+        if result is None:
+            return None
+        n, sx, sy, sxy, sxx, syy = result
+        # Centred sums, scaled by n. Exact, as everything here is an integer.
+        cov_xy = n * sxy - sx * sy
+        var_x = n * sxx - sx * sx
+        var_y = n * syy - sy * sy
+        slope = cov_xy / var_x if var_x else 0.0
+        if var_x == 0:
+            r_squared = float('nan')
+        elif var_y == 0:
+            r_squared = 1.0
+        else:
+            r_squared = cov_xy * cov_xy / (var_x * var_y)
+        return {
+            'n': n,
+            'daily_change': slope / 100,
+            'intercept': (sy - slope * sx) / n / 100,
+            'r_squared': r_squared,
+        }
+
+    def get_weight_entry(self, username, date):
+        """Get the weight logged on a specific date, or None"""
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+            SELECT weight
+            FROM weight_entries
+            WHERE username = ? AND date = ?
+            ''', (username, self.format_date(date)))
+            result = cursor.fetchone()
+        return result[0] if result else None
+
+    def get_latest_weight(self, username):
+        """Get the most recent weight for a user, or None"""
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+            SELECT weight
+            FROM weight_entries
+            WHERE username = ?
+            ORDER BY date DESC
+            LIMIT 1
+            ''', (username,))
+            result = cursor.fetchone()
+        return result[0] if result else None
+
+    def set_goal(self, username, target_weight, target_date=None):
+        """Set or update user's goal"""
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            try:
+                cursor.execute('''
+                INSERT INTO goals (username, target_weight, target_date)
+                VALUES (?, ?, ?)
+                ON CONFLICT(username) DO UPDATE SET
+                    target_weight = excluded.target_weight,
+                    target_date = excluded.target_date
+                ''', (username, target_weight, target_date))
+                conn.commit()
+                self.record_write(username)
+                return True
+            except Exception as e:
+                print(f"Error setting goal: {e}")
+                return False
 
     def get_goal(self, username):
         """Get user's goal"""
-        conn = sqlite3.connect(self.db_file)
-        cursor = conn.cursor()
-        cursor.execute('''
-        SELECT target_weight, target_date 
-        FROM goals 
-        WHERE username = ?
-        ''', (username,))
-        result = cursor.fetchone()
-        conn.close()
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+            SELECT target_weight, target_date 
+            FROM goals 
+            WHERE username = ?
+            ''', (username,))
+            result = cursor.fetchone()
         return result if result else None
 
+    def set_height(self, username, height):
+        """Set or update user's height in cm"""
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            try:
+                cursor.execute(self.HEIGHT_UPSERT_SQL, (username, height))
+                conn.commit()
+                self.record_write(username)
+                return True
+            except Exception as e:
+                print(f"Error setting height: {e}")
+                return False
+
+    def get_height(self, username):
+        """Get user's height in cm, or None"""
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('SELECT height FROM profiles WHERE username = ?', (username,))
+            result = cursor.fetchone()
+        return result[0] if result else None
+
     def add_running_entry(self, username, date, distance, duration, heart_rate):
         """Add a new running entry"""
-        conn = sqlite3.connect(self.db_file)
-        cursor = conn.cursor()
-        try:
-            cursor.execute('''
-            INSERT INTO running_entries (username, date, distance, duration, heart_rate)
-            VALUES (?, ?, ?, ?, ?)
-            ''', (username, date, distance, duration, heart_rate))
-            conn.commit()
-            return True
-        except Exception as e:
-            print(f"Error adding running entry: {e}")
-            return False
-        finally:
-            conn.close()
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            try:
+                cursor.execute('''
+                INSERT INTO running_entries (username, date, distance, duration, heart_rate)
+                VALUES (?, ?, ?, ?, ?)
+                ''', (username, date, distance, duration, heart_rate))
+                conn.commit()
+                self.record_write(username)
+                return True
+            except Exception as e:
+                print(f"Error adding running entry: {e}")
+                return False
+
+    def add_running_entries(self, entries):
+        """
+        Insert many running entries in a single transaction.
+
+        Args:
+            entries: Iterable of (username, date, distance, duration, heart_rate)
+                     tuples or dicts with those keys
+
+        Returns:
+            list: ROW_WRITTEN or ROW_INVALID per entry, in input order, or
+                  None if the batch was rolled back
+        """
+        fields = ('username', 'date', 'distance', 'duration', 'heart_rate')
+        outcomes = []
+        changed_users = set()
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            try:
+                for entry in entries:
+                    try:
+                        if isinstance(entry, dict):
+                            entry = tuple(entry[field] for field in fields)
+                        username, date, distance, duration, heart_rate = entry
+                        cursor.execute('''
+                        INSERT INTO running_entries (username, date, distance, duration, heart_rate)
+                        VALUES (?, ?, ?, ?, ?)
+                        ''', (username, self.format_date(date), float(distance), int(duration),
+                              None if heart_rate is None else int(heart_rate)))
+                    except (ValueError, TypeError, KeyError, sqlite3.IntegrityError):
+                        outcomes.append(self.ROW_INVALID)
+                        continue
+                    outcomes.append(self.ROW_WRITTEN)
+                    changed_users.add(username)
+                conn.commit()
+                for username in changed_users:
+                    self.record_write(username)
+                return outcomes
+            except Exception as e:
+                print(f"Error adding running entries: {e}")
+                return None
 
     def get_running_history(self, username):
         """Get running history for a user"""
-        conn = sqlite3.connect(self.db_file)
         query = '''
         SELECT date, distance, duration, heart_rate 
         FROM running_entries 
         WHERE username = ? 
         ORDER BY date
         '''
-        df = pd.read_sql_query(query, conn, params=(username,))
-        conn.close()
-        return df
+        with self.connection() as conn:
+            return pd.read_sql_query(query, conn, params=(username,))
 
     def delete_weight_entry(self, username, date):
         """Delete a specific weight entry"""
-        conn = sqlite3.connect(self.db_file)
-        cursor = conn.cursor()
-        try:
-            cursor.execute('''
-            DELETE FROM weight_entries 
-            WHERE username = ? AND date = ?
-            ''', (username, date))
-            conn.commit()
-            return True
-        except Exception as e:
-            print(f"Error deleting weight entry: {e}")
-            return False
-        finally:
-            conn.close()
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            try:
+                cursor.execute('''
+                DELETE FROM weight_entries 
+                WHERE username = ? AND date = ?
+                ''', (username, self.format_date(date)))
+                conn.commit()
+                self.record_write(username)
+                return True
+            except Exception as e:
+                print(f"Error deleting weight entry: {e}")
+                return False
+
+    def clear_weight_data(self, username):
+        """Clear a user's weight entries and goal, keeping the account"""
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            try:
+                cursor.execute('DELETE FROM weight_entries WHERE username = ?', (username,))
+                cursor.execute('DELETE FROM goals WHERE username = ?', (username,))
+                conn.commit()
+                self.record_write(username)
+                return True
+            except Exception as e:
+                print(f"Error clearing weight data: {e}")
+                return False
 
     def clear_user_data(self, username):
         """Clear all data for a user"""
-        conn = sqlite3.connect(self.db_file)
-        cursor = conn.cursor()
-        try:
-            # Create backup before deletion
-            self.create_backup()
-            
-            cursor.execute('DELETE FROM weight_entries WHERE username = ?', (username,))
-            cursor.execute('DELETE FROM goals WHERE username = ?', (username,))
-            cursor.execute('DELETE FROM running_entries WHERE username = ?', (username,))
-            cursor.execute('DELETE FROM users WHERE username = ?', (username,))
-            conn.commit()
-            return True
-        except Exception as e:
-            print(f"Error clearing user data: {e}")
-            return False
-        finally:
-            conn.close() 
\ No newline at end of file
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            try:
+                cursor.execute('DELETE FROM weight_entries WHERE username = ?', (username,))
+                cursor.execute('DELETE FROM goals WHERE username = ?', (username,))
+                cursor.execute('DELETE FROM running_entries WHERE username = ?', (username,))
+                cursor.execute('DELETE FROM profiles WHERE username = ?', (username,))
+                cursor.execute('DELETE FROM users WHERE username = ?', (username,))
+                conn.commit()
+                self.record_write(username)
+                return True
+            except Exception as e:
+                print(f"Error clearing user data: {e}")
+                return False
+
+def check_query_plans():
+    """
+    Run every query Database issues against a scratch database and
+    EXPLAIN QUERY PLAN each one.
+
+    Whole-table exports read every row by design and are allowed to scan;
+    any other full scan is reported.
+
+    Returns:
+        list: (sql, plan detail) pairs for statements that fully scan a
+              table. Empty when every query is served by an index.
+    """
+    import tempfile
+
+    allowed_scans = {Database.export_query(table)[0] for table in Database.EXPORT_TABLES}
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        db = Database(os.path.join(work_dir, 'plan_check.db'),
+                      backup_dir=os.path.join(work_dir, 'backups'))
+        statements = []
+        db.pool.close_all()
+        db.pool.trace_callback = statements.append
+
+        # Exercise every public query path
+        db.add_user('plan_user', 'secret')
+        db.verify_user('plan_user', 'secret')
+        db.user_exists('plan_user')
+        db.update_password('plan_user', 'new_secret')
+        db.add_weight_entry('plan_user', '2024-01-01', 80.0)
+        db.get_weight_entry('plan_user', '2024-01-01')
+        db.get_weight_history('plan_user')
+        db.get_weight_rollups('plan_user', 'week', '2024-01-01', '2024-01-31')
+        db.get_weight_trend('plan_user')
+        db.get_latest_weight('plan_user')
+        db.set_goal('plan_user', 75.0)
+        db.get_goal('plan_user')
+        db.set_height('plan_user', 180)
+        db.get_height('plan_user')
+        db.add_weight_entries([('plan_user', '2024-01-02', 79.5), ('plan_user', '2024-01-03', 79.0)])
+        db.import_weight_csv('plan_user', io.StringIO('Date,Weight\n2024-01-04,78.5\n'))
+        db.add_running_entry('plan_user', '2024-01-01', 5.0, 1500, 150)
+        db.add_running_entries([('plan_user', '2024-01-02', 6.0, 1800, 148)])
+        db.get_running_history('plan_user')
+        for table in Database.EXPORT_TABLES:
+            db.export_data(io.BytesIO(), table, username='plan_user')
+            db.export_data(io.BytesIO(), table)
+        db.delete_weight_entry('plan_user', '2024-01-01')
+        db.clear_weight_data('plan_user')
+        db.clear_user_data('plan_user')
+
+        db.pool.close_all()
+        db.pool.trace_callback = None
+        offenders = []
+        with db.connection() as conn:
+            seen = set()
+            for sql in statements:
+                verb = sql.lstrip().split(None, 1)[0].upper()
+                if (verb not in ('SELECT', 'INSERT', 'UPDATE', 'DELETE') or sql in seen
+                        or sql in allowed_scans):
+                    continue
+                seen.add(sql)
+                for row in conn.execute('EXPLAIN QUERY PLAN ' + sql):
+                    detail = row[-1]
+                    # "SCAN <table>", with or without an index, reads every row
+                    if detail.startswith('SCAN ') and 'CONSTANT ROW' not in detail:
+                        offenders.append((' '.join(sql.split()), detail))
+        db.backups.flush()
+        db.pool.close_all()
+    return offenders
+
+if __name__ == '__main__':
+    import sys
+
+    full_scans = check_query_plans()
+    for sql, detail in full_scans:
+        print(f"FULL SCAN: {detail}\n    {sql}")
+    print("Query plan check " + ("failed" if full_scans else "passed"))
+    sys.exit(1 if full_scans else 0)
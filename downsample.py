@@ -0,0 +1,90 @@
+"""
+Visual downsampling for long weight histories.
+
+Largest-Triangle-Three-Buckets (LTTB) splits a series into as many buckets
+as points are wanted and keeps, from each bucket, the point that forms the
+largest triangle with its neighbours. Peaks, dips and the overall shape
+survive, so a chart drawn from a couple of points per pixel looks like one
+drawn from every weigh-in, at a fraction of the payload and render time.
+"""
+
+import numpy as np
+
+# Width charts are sized for (the wide layout on a desktop screen) and how
+# many points per pixel are worth drawing
+CHART_WIDTH_PX = 1200
+POINTS_PER_PIXEL = 2
+
+# Above this many points a trace is drawn with WebGL (Scattergl) instead of SVG
+WEBGL_THRESHOLD = 1500
+
+def point_budget(width_px=CHART_WIDTH_PX):
+    """Most points worth drawing on a chart width_px pixels wide"""
+    return width_px * POINTS_PER_PIXEL
+
+def use_webgl(n_points):
+    """Whether a trace of n_points should be drawn with Scattergl"""
+    return n_points > WEBGL_THRESHOLD
+
+def lttb_indices(x, y, n_out):
+    """
+    Pick the points LTTB keeps.
+
+    Args:
+        x (array-like): Numeric x values, sorted ascending
+        y (array-like): y values
+        n_out (int): Number of points wanted
+
+    Returns:
+        np.ndarray: Sorted indices of the kept points. The first and last
+                    points are always kept; every index is kept when the
+                    series is not longer than n_out.
+    """
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    n = len(x)
+    if n <= n_out or n_out < 3:
+        return np.arange(n)
+
+    # n_out - 2 buckets between the fixed first and last points
+    every = (n - 2) / (n_out - 2)
+    edges = (np.arange(n_out - 1) * every).astype(int) + 1
+    edges[-1] = n - 1
+
+    keep = np.empty(n_out, dtype=int)
+    keep[0], keep[-1] = 0, n - 1
+    selected = 0
+    for i in range(n_out - 2):
+        start, end = edges[i], edges[i + 1]
+        # The next bucket's average is the triangle's third corner
+        if i + 2 < len(edges):
+            next_x = x[end:edges[i + 2]].mean()
+            next_y = y[end:edges[i + 2]].mean()
+        else:
+            next_x, next_y = x[-1], y[-1]
+        area = np.abs((x[selected] - next_x) * (y[start:end] - y[selected])
+                      - (x[selected] - x[start:end]) * (next_y - y[selected]))
+        selected = start + int(area.argmax())
+        keep[i + 1] = selected
+    return keep
+
+def downsample(df, x_column, y_column, n_out=None):
+    """
+    Reduce a frame to the rows LTTB keeps for a chart.
+
+    Args:
+        df (pd.DataFrame): Rows sorted by x_column
+        x_column (str): Date or numeric column plotted on the x axis
+        y_column (str): Column plotted on the y axis
+        n_out (int, optional): Points wanted, point_budget() by default
+
+    Returns:
+        pd.DataFrame: df itself when it is short enough, else the kept rows
+    """
+    n_out = n_out or point_budget()
+    if len(df) <= n_out:
+        return df
+    x = df[x_column]
+    if np.issubdtype(x.dtype, np.datetime64):
+        x = x.values.astype('datetime64[ns]').astype(np.int64)
+    return df.iloc[lttb_indices(x, df[y_column], n_out)]
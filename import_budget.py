@@ -0,0 +1,152 @@
+"""
+Import-time budget for the app's cold start.
+
+Runs streamlit_app.py the way a fresh server process first renders the login
+page (no session, bare mode) under ``python -X importtime`` and reports what
+the imports cost, next to what ``import streamlit`` alone costs. Fails when
+the total goes over budget or when the app, rather than streamlit itself,
+loads a library that only some pages need on the way to the login page.
+
+The app runs in a scratch directory, so no database or backups are created
+next to the code.
+
+Usage:
+    python import_budget.py [--budget-ms 1800] [--runs 3] [--top 15] [--json report.json]
+"""
+
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+# Libraries that pages import on demand; none may load for the login page
+DEFERRED_MODULES = ('matplotlib', 'plotly', 'PIL', 'sklearn', 'requests')
+
+# Roughly a third below what the login page cost while every library was
+# imported at module top
+DEFAULT_BUDGET_MS = 1800
+
+# Render the login page once in bare mode, as a cold server process would
+APP_RUNNER = (
+    "import runpy, warnings; warnings.simplefilter('ignore'); "
+    "runpy.run_path('streamlit_app.py', run_name='__main__')"
+)
+BASELINE_RUNNER = "import streamlit"
+
+# Files the app writes at startup; everything else is linked into the scratch dir
+RUNTIME_FILES = ('fitness_tracker.db', 'backups', '__pycache__')
+
+def parse_importtime(stderr):
+    """
+    Parse ``-X importtime`` output.
+
+    Returns:
+        list: (module, self_us, cumulative_us, depth) per import, in the
+              order the interpreter finished them.
+    """
+    imports = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'imported package' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|', 2)
+        depth = (len(name) - len(name.lstrip())) // 2
+        imports.append((name.strip(), int(self_us), int(cumulative_us), depth))
+    return imports
+
+def run_importtime(code, cwd):
+    """
+    Run code in a fresh interpreter under -X importtime.
+
+    Returns:
+        tuple: (parsed imports, wall clock milliseconds)
+    """
+    env = dict(os.environ, PYTHONDONTWRITEBYTECODE='1')
+    started = time.perf_counter()
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', code],
+                            cwd=cwd, env=env, capture_output=True, text=True)
+    wall_ms = (time.perf_counter() - started) * 1000
+    if result.returncode != 0:
+        raise RuntimeError(f"{code!r} failed:\n{result.stderr[-2000:]}")
+    return parse_importtime(result.stderr), wall_ms
+
+def measure(app_dir, runs=3):
+    """
+    Time the login page cold start and an import of streamlit alone.
+
+    Each is run several times and the fastest run is kept, which filters
+    out noise from the disk cache and other processes.
+    """
+    work_dir = tempfile.mkdtemp(prefix='import_budget_')
+    try:
+        for name in os.listdir(app_dir):
+            if not name.startswith(RUNTIME_FILES):
+                os.symlink(os.path.join(app_dir, name), os.path.join(work_dir, name))
+        imports, wall_ms = min((run_importtime(APP_RUNNER, work_dir) for _ in range(runs)),
+                               key=lambda run: sum(i[1] for i in run[0]))
+        baseline, _ = min((run_importtime(BASELINE_RUNNER, work_dir) for _ in range(runs)),
+                          key=lambda run: sum(i[1] for i in run[0]))
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    # Top-level packages and the time their whole import tree took
+    packages = {}
+    for name, _, cumulative_us, depth in imports:
+        if depth == 1:
+            root = name.split('.')[0]
+            packages[root] = packages.get(root, 0) + cumulative_us
+    loaded = {name.split('.')[0] for name, _, _, _ in imports}
+    loaded_by_streamlit = {name.split('.')[0] for name, _, _, _ in baseline}
+    return {
+        'wall_ms': round(wall_ms, 1),
+        'import_ms': round(sum(self_us for _, self_us, _, _ in imports) / 1000, 1),
+        'streamlit_import_ms': round(sum(self_us for _, self_us, _, _ in baseline) / 1000, 1),
+        'modules': len(imports),
+        'packages_ms': {name: round(us / 1000, 1) for name, us in
+                        sorted(packages.items(), key=lambda item: item[1], reverse=True)},
+        'deferred_loaded': sorted(name for name in DEFERRED_MODULES
+                                  if name in loaded and name not in loaded_by_streamlit),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--budget-ms', type=float, default=DEFAULT_BUDGET_MS,
+                        help="Maximum total import time in milliseconds")
+    parser.add_argument('--runs', type=int, default=3,
+                        help="Cold starts to measure; the fastest is reported")
+    parser.add_argument('--top', type=int, default=15,
+                        help="Number of packages to list")
+    parser.add_argument('--json', metavar='PATH',
+                        help="Also write the report as JSON")
+    args = parser.parse_args()
+
+    report = measure(os.path.dirname(os.path.abspath(__file__)), max(1, args.runs))
+    report['budget_ms'] = args.budget_ms
+
+    print(f"Login page cold start: {report['wall_ms']:.0f} ms wall, "
+          f"{report['import_ms']:.0f} ms importing {report['modules']} modules "
+          f"(budget {args.budget_ms:.0f} ms)")
+    print(f"  streamlit alone: {report['streamlit_import_ms']:.0f} ms importing")
+    for name, ms in list(report['packages_ms'].items())[:args.top]:
+        print(f"  {ms:8.1f} ms  {name}")
+
+    failures = []
+    if report['import_ms'] > args.budget_ms:
+        failures.append(f"import time {report['import_ms']:.0f} ms is over budget")
+    if report['deferred_loaded']:
+        failures.append("loaded for the login page: " + ', '.join(report['deferred_loaded']))
+    report['passed'] = not failures
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    print("Import budget check " + ("failed" if failures else "passed"))
+    return 1 if failures else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
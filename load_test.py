@@ -0,0 +1,256 @@
+"""
+Concurrent-session load test for the app's pages.
+
+Loads a synthetic multi-user database (see benchmark.py) into a scratch
+directory, then drives each page through Streamlit AppTest sessions running
+in parallel threads, one simulated user per session. Every session reruns
+its page repeatedly, the way each widget interaction does, while the
+concurrency is stepped up. For every page and level the report gives
+p50/p95/p99 rerun latency and reruns per second, and names the knee: the
+last level at which adding sessions still bought meaningful throughput.
+
+Sessions share one process, its st.cache_resource objects (the Database and
+its connection pool) and the GIL, just as they do on a Streamlit server.
+
+Usage:
+    python load_test.py [--rows 100000] [--concurrency 1,2,4,8,16]
+                        [--reruns 10] [--pages fitness_tracker,data_nerds_page]
+                        [--json report.json]
+"""
+
+import argparse
+import json
+import logging
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import warnings
+
+import numpy as np
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, APP_DIR)
+
+from benchmark import load_dataset, user_name
+from database import Database
+from import_budget import RUNTIME_FILES
+
+# Page function -> session state the __main__ router dispatches it on
+PAGES = {
+    'login_page': {'logged_in': False},
+    'fitness_tracker': {'logged_in': True},
+    'health_dashboard_page': {'logged_in': True, 'show_health_dashboard': True},
+    'running_assistant_page': {'logged_in': True, 'show_running_assistant': True},
+    'calorie_calculator_page': {'logged_in': True, 'show_calorie_calculator': True},
+    'data_nerds_page': {'logged_in': True, 'show_data_nerds': True},
+}
+
+DEFAULT_CONCURRENCY = (1, 2, 4, 8, 16)
+
+# Going up a level must raise throughput by at least this much to be worth it
+KNEE_MIN_GAIN = 0.10
+
+def prepare_app_dir(rows):
+    """
+    Link the app into a scratch directory and give it a synthetic database.
+
+    Returns:
+        tuple: (scratch directory, dataset shape from load_dataset)
+    """
+    work_dir = tempfile.mkdtemp(prefix='load_test_')
+    for name in os.listdir(APP_DIR):
+        if not name.startswith(RUNTIME_FILES):
+            os.symlink(os.path.join(APP_DIR, name), os.path.join(work_dir, name))
+
+    database = Database(os.path.join(work_dir, 'fitness_tracker.db'),
+                        backup_dir=os.path.join(work_dir, 'backups'))
+    try:
+        dataset = load_dataset(database, rows)
+        for index in range(dataset['users']):
+            username = user_name(index)
+            latest = database.get_latest_weight(username)
+            database.set_goal(username, round(latest - 5, 1))
+            database.set_height(username, 175)
+    finally:
+        # The app opens its own Database on the file; this one is done
+        database.backups.flush()
+        database.pool.close_all()
+    return work_dir, dataset
+
+def share_script_cache():
+    """
+    Compile the app once for every session, as the server does.
+
+    AppTest builds fresh ScriptCaches on each run, so every rerun would
+    otherwise recompile the whole script, and concurrent compiles of the
+    same file are not safe on every Python version.
+    """
+    from streamlit.testing.v1 import app_test, local_script_runner
+    shared = app_test.ScriptCache()
+    app_test.ScriptCache = local_script_runner.ScriptCache = lambda: shared
+
+def share_runtime():
+    """
+    Give every session the same mock Runtime, as the server has one Runtime.
+
+    Each AppTest run installs its own mock as the global Runtime instance and
+    removes it when done, which pulls the Runtime out from under any other
+    session that is still running. Here the first mock installed stays.
+    """
+    from streamlit.testing.v1 import app_test
+    from streamlit.runtime import Runtime
+
+    class KeepFirstInstance(type(Runtime)):
+        def __setattr__(cls, name, value):
+            if name != '_instance':
+                super().__setattr__(name, value)
+            elif Runtime._instance is None:
+                Runtime._instance = value
+
+    app_test.Runtime = KeepFirstInstance('SharedRuntime', (Runtime,), {})
+
+def run_session(script, state, reruns, timeout, latencies, errors, start_barrier):
+    """Open one session on a page and time each rerun after the first"""
+    from streamlit.testing.v1 import AppTest
+
+    try:
+        at = AppTest.from_file(script, default_timeout=timeout)
+        for key, value in state.items():
+            at.session_state[key] = value
+        # The first run sets up the session; only the reruns that follow
+        # are timed, once every session at this level is ready
+        at.run()
+        start_barrier.wait()
+        for _ in range(reruns):
+            started = time.perf_counter()
+            at.run()
+            latencies.append((time.perf_counter() - started) * 1000)
+            if at.exception:
+                errors.append(str(at.exception[0].value))
+                return
+    except threading.BrokenBarrierError:
+        pass
+    except Exception as e:
+        errors.append(str(e))
+        start_barrier.abort()
+
+def run_level(script, page, concurrency, users, reruns, timeout):
+    """
+    Rerun one page from concurrency sessions at once.
+
+    Returns:
+        dict: Latency percentiles, throughput and error count for the level
+    """
+    latencies, errors = [], []
+    # The extra party is this thread, which starts the clock
+    start_barrier = threading.Barrier(concurrency + 1)
+    threads = []
+    for i in range(concurrency):
+        state = dict(PAGES[page], username=user_name(i % users))
+        threads.append(threading.Thread(
+            target=run_session, name=f'load-{page}-{i}',
+            args=(script, state, reruns, timeout, latencies, errors, start_barrier)))
+    for thread in threads:
+        thread.start()
+    try:
+        start_barrier.wait()
+    except threading.BrokenBarrierError:
+        pass
+    started = time.perf_counter()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    result = {'concurrency': concurrency, 'reruns': len(latencies), 'errors': len(errors),
+              'throughput_rps': round(len(latencies) / elapsed, 2) if elapsed else 0.0}
+    if latencies:
+        p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+        result.update(p50_ms=round(p50, 1), p95_ms=round(p95, 1), p99_ms=round(p99, 1))
+    if errors:
+        result['first_error'] = errors[0]
+    return result
+
+def find_knee(levels):
+    """Highest concurrency whose throughput gain over the level below was worth it"""
+    knee = levels[0]['concurrency'] if levels else None
+    for lower, upper in zip(levels, levels[1:]):
+        if lower['throughput_rps'] <= 0 or upper['errors']:
+            break
+        if upper['throughput_rps'] / lower['throughput_rps'] - 1 < KNEE_MIN_GAIN:
+            break
+        knee = upper['concurrency']
+    return knee
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, default=100_000,
+                        help="Weight entries in the synthetic database")
+    parser.add_argument('--concurrency', default=','.join(map(str, DEFAULT_CONCURRENCY)),
+                        help="Comma-separated numbers of simultaneous sessions")
+    parser.add_argument('--reruns', type=int, default=10,
+                        help="Timed reruns per session")
+    parser.add_argument('--pages', default=','.join(PAGES),
+                        help="Comma-separated page functions to drive")
+    parser.add_argument('--timeout', type=float, default=120,
+                        help="Seconds a single rerun may take before it fails")
+    parser.add_argument('--json', metavar='PATH',
+                        help="Also write the report as JSON")
+    args = parser.parse_args()
+    levels = sorted({int(level) for level in args.concurrency.split(',') if level.strip()})
+    pages = [page.strip() for page in args.pages.split(',') if page.strip()]
+    unknown = [page for page in pages if page not in PAGES]
+    if unknown:
+        parser.error(f"unknown pages: {', '.join(unknown)} (choose from {', '.join(PAGES)})")
+
+    warnings.simplefilter('ignore')
+    # Bare-mode and AppTest warnings would drown out the report
+    logging.disable(logging.WARNING)
+
+    share_script_cache()
+    share_runtime()
+
+    json_path = os.path.abspath(args.json) if args.json else None
+    cwd = os.getcwd()
+    work_dir, dataset = prepare_app_dir(args.rows)
+    print(f"Synthetic database: {dataset['weight_rows']:,} weight entries, "
+          f"{dataset['users']} users")
+    report = {'rows': args.rows, 'dataset': dataset, 'reruns_per_session': args.reruns,
+              'pages': {}}
+    try:
+        # The app opens fitness_tracker.db and backups/ relative to cwd
+        os.chdir(work_dir)
+        script = os.path.join(work_dir, 'streamlit_app.py')
+        for page in pages:
+            print(f"\n{page}")
+            print(f"  {'sessions':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} "
+                  f"{'reruns/s':>9} {'errors':>6}")
+            results = []
+            for concurrency in levels:
+                result = run_level(script, page, concurrency, dataset['users'],
+                                   max(1, args.reruns), args.timeout)
+                results.append(result)
+                print(f"  {concurrency:>8} {result.get('p50_ms', float('nan')):>9.1f} "
+                      f"{result.get('p95_ms', float('nan')):>9.1f} "
+                      f"{result.get('p99_ms', float('nan')):>9.1f} "
+                      f"{result['throughput_rps']:>9.2f} {result['errors']:>6}")
+                if result['errors']:
+                    print(f"    first error: {result['first_error']}")
+            knee = find_knee(results)
+            print(f"  knee: {knee} concurrent sessions")
+            report['pages'][page] = {'levels': results, 'knee': knee}
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    if json_path:
+        with open(json_path, 'w') as f:
+            json.dump(report, f, indent=2)
+    failed = any(level['errors'] for page in report['pages'].values()
+                 for level in page['levels'])
+    return 1 if failed else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,190 @@
+"""
+Prometheus-style metrics exporter.
+
+Latency histograms are fed from the timing log (pages, page fragments,
+Database calls, CSV reads and backup stages), so nothing new is timed on the
+hot path: each timed call adds one bucket increment, and only while the
+exporter runs.
+Counters and gauges that already exist elsewhere (cache hits, database
+size, sessions) are read when the endpoint is scraped.
+
+Served in the Prometheus text format from a side port with http.server,
+on the loopback interface only unless FITTRACK_METRICS_HOST says otherwise:
+    FITTRACK_METRICS_PORT=9464 streamlit run streamlit_app.py
+    curl localhost:9464/metrics
+"""
+
+import bisect
+import os
+import threading
+
+from timings import timings
+
+# Seconds; covers sub-millisecond queries up to multi-second page renders
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Timing log kind -> (metric name, help text, label name)
+TIMING_HISTOGRAMS = {
+    'page': ('fittrack_page_render_seconds', 'Time to render a page', 'page'),
+    'fragment': ('fittrack_fragment_render_seconds', 'Time to render a page fragment',
+                 'fragment'),
+    'query': ('fittrack_db_call_seconds', 'Time spent in a Database method', 'method'),
+    'csv': ('fittrack_csv_read_seconds', 'Time to read a CSV file or chunk', 'source'),
+    'backup': ('fittrack_backup_duration_seconds', 'Time spent in a backup stage', 'stage'),
+}
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _format_value(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class Histogram:
+    def __init__(self, name, help_text, label, buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.label = label
+        self.buckets = tuple(buckets)
+        # label value -> per-bucket counts (the last one is +Inf), then sum
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, label_value, seconds):
+        index = bisect.bisect_left(self.buckets, seconds)
+        with self._lock:
+            series = self._series.get(label_value)
+            if series is None:
+                series = self._series[label_value] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[index] += 1
+            series[-1] += seconds
+
+    def render(self):
+        with self._lock:
+            snapshot = {label_value: list(series) for label_value, series in self._series.items()}
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        for label_value, series in sorted(snapshot.items()):
+            label = f'{self.label}="{_escape(label_value)}"'
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), series):
+                cumulative += count
+                le = '+Inf' if bound == float('inf') else repr(bound)
+                lines.append(f'{self.name}_bucket{{{label},le="{le}"}} {cumulative}')
+            lines.append(f"{self.name}_sum{{{label}}} {series[-1]!r}")
+            lines.append(f"{self.name}_count{{{label}}} {cumulative}")
+        return lines
+
+class MetricsRegistry:
+    def __init__(self):
+        self._histograms = {}
+        self._callbacks = []  # (name, help, type, fn)
+        self._lock = threading.Lock()
+
+    def histogram(self, name, help_text, label, buckets=DEFAULT_BUCKETS):
+        with self._lock:
+            if name not in self._histograms:
+                self._histograms[name] = Histogram(name, help_text, label, buckets)
+            return self._histograms[name]
+
+    def callback(self, name, help_text, metric_type, fn):
+        """
+        Register a counter or gauge read at scrape time.
+
+        Args:
+            fn: Callable returning a number, or a list of (labels dict, number)
+        """
+        with self._lock:
+            self._callbacks = [entry for entry in self._callbacks if entry[0] != name]
+            self._callbacks.append((name, help_text, metric_type, fn))
+
+    def observe_timing(self, kind, name, elapsed_ms):
+        """Timing log observer: feed the histogram for the sample's kind"""
+        spec = TIMING_HISTOGRAMS.get(kind)
+        if spec is not None:
+            self.histogram(*spec).observe(name, elapsed_ms / 1000)
+
+    def render(self):
+        """All metrics in the Prometheus text exposition format"""
+        with self._lock:
+            histograms = list(self._histograms.values())
+            callbacks = list(self._callbacks)
+        lines = []
+        for name, help_text, metric_type, fn in callbacks:
+            try:
+                value = fn()
+            except Exception as e:
+                print(f"Error reading metric {name}: {e}")
+                continue
+            lines += [f"# HELP {name} {help_text}", f"# TYPE {name} {metric_type}"]
+            samples = value if isinstance(value, list) else [({}, value)]
+            for labels, sample in samples:
+                label_text = ','.join(f'{key}="{_escape(val)}"' for key, val in labels.items())
+                lines.append(f"{name}{{{label_text}}} {_format_value(sample)}" if label_text
+                             else f"{name} {_format_value(sample)}")
+        for histogram in histograms:
+            lines += histogram.render()
+        return '\n'.join(lines) + '\n'
+
+# Shared by every session in the process
+registry = MetricsRegistry()
+
+def watch_database(database):
+    """Export a Database's file size and dataset cache counters"""
+    def size_bytes():
+        files = {'main': database.db_file, 'wal': database.db_file + '-wal'}
+        return [({'file': name}, os.path.getsize(path))
+                for name, path in files.items() if os.path.exists(path)]
+
+    def cache_stat(key):
+        return lambda: database.cache.stats()[key]
+
+    registry.callback('fittrack_db_size_bytes', 'Size of the SQLite database files',
+                      'gauge', size_bytes)
+    registry.callback('fittrack_cache_hits_total', 'Dataset cache hits', 'counter',
+                      cache_stat('hits'))
+    registry.callback('fittrack_cache_misses_total', 'Dataset cache misses', 'counter',
+                      cache_stat('misses'))
+    registry.callback('fittrack_cache_evictions_total', 'Dataset cache evictions', 'counter',
+                      cache_stat('evictions'))
+    registry.callback('fittrack_cache_bytes', 'Estimated memory held by the dataset cache',
+                      'gauge', cache_stat('bytes'))
+    registry.callback('fittrack_backup_pending', 'Whether writes are waiting for a backup',
+                      'gauge', lambda: int(database.backups.pending()))
+
+def start_server(port, host='127.0.0.1'):
+    """
+    Serve /metrics on a daemon thread and start feeding the histograms.
+
+    Binds to the loopback interface by default, so only a local scraper can
+    read it; pass host='' or '0.0.0.0' to expose it on every interface.
+
+    Returns:
+        ThreadingHTTPServer: The running server, or None if the port is taken
+    """
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split('?', 1)[0] != '/metrics':
+                self.send_error(404)
+                return
+            body = registry.render().encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            # Scrapes every few seconds would flood the server log
+            pass
+
+    try:
+        server = ThreadingHTTPServer((host, port), MetricsHandler)
+    except OSError as e:
+        print(f"Error starting metrics server on {host}:{port}: {e}")
+        return None
+    server.daemon_threads = True
+    if registry.observe_timing not in timings.observers:
+        timings.observers.append(registry.observe_timing)
+    threading.Thread(target=server.serve_forever, name='metrics-server', daemon=True).start()
+    return server
@@ -0,0 +1,98 @@
+"""
+Server-side login sessions.
+
+A session token is "<session id>.<expiry>.<signature>", where the signature
+is an HMAC-SHA256 over the id and expiry. Forged or tampered tokens are
+rejected by the signature check alone. Valid ones resolve to a username
+through an in-memory table, so a returning user costs one dict lookup
+instead of a credential check. Sessions expire after a fixed TTL and are
+evicted lazily, oldest first.
+"""
+
+import hashlib
+import hmac
+import os
+import secrets
+import threading
+import time
+from collections import OrderedDict
+
+# The token travels in the URL, where it can leak through history, logs or
+# a shared link, so sessions are kept short and rotated on every resume
+DEFAULT_TTL = 12 * 3600  # Twelve hours
+
+class SessionStore:
+    def __init__(self, secret=None, ttl=DEFAULT_TTL, max_sessions=100000):
+        # Without a configured secret, tokens are valid for this process only,
+        # which matches the lifetime of the in-memory session table
+        secret = secret or os.environ.get('FITTRACK_SESSION_SECRET')
+        self.secret = secret.encode('utf-8') if secret else secrets.token_bytes(32)
+        self.ttl = ttl
+        self.max_sessions = max_sessions
+        self._sessions = OrderedDict()  # session id -> (username, expires)
+        self._lock = threading.Lock()
+
+    def _sign(self, session_id, expires):
+        message = f"{session_id}.{expires}".encode('utf-8')
+        return hmac.new(self.secret, message, hashlib.sha256).hexdigest()
+
+    def _evict_expired(self, now):
+        # Every session gets the same TTL, so insertion order is expiry order
+        while self._sessions:
+            session_id, (_, expires) = next(iter(self._sessions.items()))
+            if expires > now and len(self._sessions) <= self.max_sessions:
+                break
+            del self._sessions[session_id]
+
+    def create(self, username):
+        """Start a session for username and return its token"""
+        now = time.time()
+        session_id = secrets.token_urlsafe(16)
+        expires = int(now + self.ttl)
+        with self._lock:
+            self._sessions[session_id] = (username, expires)
+            self._evict_expired(now)
+        return f"{session_id}.{expires}.{self._sign(session_id, expires)}"
+
+    def resolve(self, token):
+        """
+        Look up the user a token belongs to.
+
+        Returns:
+            str: The username, or None if the token is malformed, forged,
+                 expired or revoked.
+        """
+        try:
+            session_id, expires, signature = str(token).split('.')
+            expires = int(expires)
+        except ValueError:
+            return None
+        if not hmac.compare_digest(signature, self._sign(session_id, expires)):
+            return None
+        now = time.time()
+        with self._lock:
+            entry = self._sessions.get(session_id)
+            if entry is None:
+                return None
+            username, stored_expires = entry
+            if stored_expires != expires or stored_expires <= now:
+                del self._sessions[session_id]
+                return None
+        return username
+
+    def revoke(self, token):
+        """End a single session"""
+        session_id = str(token).split('.', 1)[0]
+        with self._lock:
+            self._sessions.pop(session_id, None)
+
+    def revoke_user(self, username):
+        """End every session of a user, e.g. after a password change"""
+        with self._lock:
+            for session_id in [sid for sid, (user, _) in self._sessions.items()
+                               if user == username]:
+                del self._sessions[session_id]
+
+    def stats(self):
+        with self._lock:
+            return {'sessions': len(self._sessions)}
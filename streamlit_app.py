@@ -16,318 +16,143 @@ Version: 1.0.0
 
 import streamlit as st
 import pandas as pd
-import matplotlib.pyplot as plt
+import numpy as np
 from datetime import datetime, timedelta
 import os
-import requests
-from PIL import Image
-from io import BytesIO
+import tempfile
 import time
+from io import BytesIO
 import math
-import plotly.graph_objects as go
-from plotly.subplots import make_subplots
-from database import Database
+import functools
+# Plotting and imaging libraries (plotly, matplotlib, PIL) are imported inside
+# the pages that draw with them, so the login page never pays for loading them.
+# Check the startup cost with: python import_budget.py
+from database import Database, TREND_EPOCH
+from session_store import SessionStore
+from downsample import downsample, point_budget, use_webgl
+from timings import timings
+from streamlit.errors import StreamlitAPIException
 
 # Initialize database
-db = Database()
+@st.cache_resource
+def get_database():
+    """
+    Create the process-wide Database so its connection pool is shared by
+    every session and rerun instead of being rebuilt on each script run.
+    """
+    database = Database()
+    database.migrate_legacy_files()
+    return database
 
-# --- Custom CSS ---
-st.markdown("""
-    <style>
-    /* Main theme colors */
-    :root {
-        --primary-color: #00B4D8;
-        --secondary-color: #0077B6;
-        --background-color: #0A192F;
-        --secondary-bg: #112240;
-        --text-color: #E6F1FF;
-        --border-color: #233554;
-        --input-bg: #1D3461;
-        --hover-color: #0096C7;
-        --box-shadow: 0 4px 6px rgba(0, 0, 0, 0.1);
-        --gradient: linear-gradient(135deg, var(--primary-color), var(--secondary-color));
-    }
-    
-    /* Global Animations */
-    @keyframes fadeIn {
-        from { opacity: 0; transform: translateY(10px); }
-        to { opacity: 1; transform: translateY(0); }
-    }
-    
-    @keyframes scaleIn {
-        from { transform: scale(0.95); opacity: 0; }
-        to { transform: scale(1); opacity: 1; }
-    }
-    
-    @keyframes slideIn {
-        from { transform: translateX(-20px); opacity: 0; }
-        to { transform: translateX(0); opacity: 1; }
-    }
-    
-    /* Custom styling for the entire app */
-    .stApp {
-        background-color: var(--background-color);
-        color: var(--text-color);
-        width: 100%;
-        max-width: 100%;
-        margin: 0;
-        padding: 0;
-        animation: fadeIn 0.5s ease-out;
-    }
-    
-    /* Main content container */
-    .main .block-container {
-        padding: 1rem 2rem;
-        max-width: 100%;
-        animation: scaleIn 0.4s ease-out;
-    }
-    
-    /* Sidebar container with slide animation */
-    .css-1d391kg {
-        background-color: var(--secondary-bg);
-        padding: 1.5rem;
-        border-right: 1px solid var(--border-color);
-        width: 100%;
-        box-shadow: var(--box-shadow);
-        animation: slideIn 0.4s ease-out;
-    }
-    
-    /* Enhanced button styling */
-    .stButton > button {
-        background: var(--gradient) !important;
-        color: white !important;
-        border: none !important;
-        padding: 0.6rem 1.2rem !important;
-        border-radius: 8px !important;
-        font-weight: 600 !important;
-        letter-spacing: 0.5px !important;
-        box-shadow: var(--box-shadow) !important;
-        transition: all 0.3s ease !important;
-        position: relative !important;
-        overflow: hidden !important;
-    }
-    
-    .stButton > button:hover {
-        transform: translateY(-2px) !important;
-        box-shadow: 0 6px 12px rgba(0, 0, 0, 0.2) !important;
-    }
-    
-    .stButton > button:active {
-        transform: translateY(1px) !important;
-        box-shadow: 0 2px 4px rgba(0, 0, 0, 0.1) !important;
-    }
-    
-    /* Ripple effect for buttons */
-    .stButton > button::after {
-        content: '';
-        position: absolute;
-        top: 50%;
-        left: 50%;
-        width: 5px;
-        height: 5px;
-        background: rgba(255, 255, 255, 0.5);
-        opacity: 0;
-        border-radius: 100%;
-        transform: scale(1, 1) translate(-50%);
-        transform-origin: 50% 50%;
-    }
-    
-    .stButton > button:focus:not(:active)::after {
-        animation: ripple 1s ease-out;
-    }
-    
-    @keyframes ripple {
-        0% {
-            transform: scale(0, 0);
-            opacity: 0.5;
-        }
-        100% {
-            transform: scale(100, 100);
-            opacity: 0;
-        }
-    }
-    
-    /* Enhanced input fields */
-    .stNumberInput > div > div > input,
-    .stTextInput > div > div > input,
-    .stDateInput > div > div > input {
-        background-color: var(--input-bg) !important;
-        border: 2px solid var(--border-color) !important;
-        border-radius: 8px !important;
-        padding: 0.6rem !important;
-        transition: all 0.3s ease !important;
-    }
-    
-    .stNumberInput > div > div > input:focus,
-    .stTextInput > div > div > input:focus,
-    .stDateInput > div > div > input:focus {
-        border-color: var(--primary-color) !important;
-        box-shadow: 0 0 0 2px rgba(0, 180, 216, 0.2) !important;
-        transform: translateY(-1px) !important;
-    }
-    
-    /* Enhanced section containers with hover effect */
-    .section-container {
-        background-color: var(--secondary-bg);
-        padding: 1.2rem;
-        border-radius: 12px;
-        border: 1px solid var(--border-color);
-        margin: 0.8rem 0;
-        box-shadow: var(--box-shadow);
-        width: 100%;
-        transition: all 0.3s ease;
-        animation: scaleIn 0.4s ease-out;
-    }
-    
-    .section-container:hover {
-        transform: translateY(-2px);
-        box-shadow: 0 8px 16px rgba(0, 0, 0, 0.2);
-    }
-    
-    /* Smooth expanding sections */
-    .streamlit-expanderHeader {
-        transition: all 0.3s ease !important;
-    }
-    
-    .streamlit-expanderContent {
-        animation: fadeIn 0.4s ease-out;
-    }
-    
-    /* Enhanced metrics with animation */
-    .stMetric {
-        animation: scaleIn 0.4s ease-out;
-    }
-    
-    .stMetric:hover {
-        transform: scale(1.02);
-        transition: transform 0.3s ease;
-    }
-    
-    /* Smooth chart animations */
-    .js-plotly-plot {
-        animation: fadeIn 0.6s ease-out;
-    }
-    
-    /* Enhanced select boxes */
-    .stSelectbox > div > div {
-        transition: all 0.3s ease !important;
-    }
-    
-    .stSelectbox > div > div:hover {
-        border-color: var(--primary-color) !important;
-    }
-    
-    /* Smooth radio button transitions */
-    .stRadio > div {
-        transition: all 0.3s ease !important;
-    }
-    
-    .stRadio > div:hover {
-        transform: translateX(5px);
-    }
-    
-    /* Enhanced tabs */
-    .stTabs > div > div > div {
-        transition: all 0.3s ease !important;
-    }
-    
-    .stTabs > div > div > div:hover {
-        background-color: rgba(0, 180, 216, 0.1) !important;
-    }
-    
-    /* Page transition effect */
-    .main > div:first-child {
-        animation: fadeIn 0.5s ease-out;
-    }
-    
-    /* Loading animation */
-    .stProgress > div > div {
-        background: var(--gradient) !important;
-        transition: width 0.3s ease-in-out !important;
-    }
-    
-    /* Checkbox animations */
-    .stCheckbox > div > div > div {
-        transition: all 0.3s ease !important;
-    }
-    
-    .stCheckbox > div > div > div:hover {
-        transform: scale(1.1);
-    }
-    
-    /* Date picker enhancements */
-    .stDateInput > div {
-        transition: all 0.3s ease !important;
-    }
-    
-    .stDateInput > div:hover {
-        border-color: var(--primary-color) !important;
-    }
-    
-    /* Slider enhancements */
-    .stSlider > div > div > div {
-        transition: all 0.3s ease !important;
-    }
-    
-    .stSlider > div > div > div[data-baseweb="thumb"] {
-        background: var(--gradient) !important;
-    }
-    
-    /* Table hover effects */
-    .stDataFrame {
-        animation: fadeIn 0.5s ease-out;
-    }
-    
-    .stDataFrame td:hover {
-        background-color: rgba(0, 180, 216, 0.1) !important;
-        transition: background-color 0.3s ease;
-    }
-    
-    /* Success/Error message animations */
-    .stSuccess, .stError, .stWarning, .stInfo {
-        animation: slideIn 0.4s ease-out;
-    }
-    </style>
-    """, unsafe_allow_html=True)
+db = get_database()
 
-# --- Constants ---
-USERS_FILE = "users.csv"  # File to store user credentials
-LEADERBOARD_FILE = "leaderboard.csv"  # File for future leaderboard feature
+@st.cache_resource
+def get_session_store():
+    """
+    Create the process-wide session table shared by every browser session.
+    """
+    return SessionStore()
 
-# --- Helper Functions ---
-def load_users():
+sessions = get_session_store()
+
+@st.cache_resource
+def get_metrics_server():
     """
-    Load user credentials from CSV file.
+    Start the Prometheus-style metrics exporter once per process, on the
+    port in FITTRACK_METRICS_PORT. Nothing is started when it is unset.
     
-    Returns:
-        pd.DataFrame: DataFrame containing username and password columns.
-                     Returns empty DataFrame if file doesn't exist.
+    It listens on 127.0.0.1 unless FITTRACK_METRICS_HOST names another
+    interface.
     """
-    try:
-        if os.path.exists(USERS_FILE):
-            df = pd.read_csv(USERS_FILE)
-            # Clean the data
-            df["Username"] = df["Username"].astype(str).str.strip()
-            df["Password"] = df["Password"].astype(str).str.strip()
-            return df
-        return pd.DataFrame(columns=["Username", "Password"])
-    except Exception as e:
-        st.error(f"Error loading users: {str(e)}")
-        return pd.DataFrame(columns=["Username", "Password"])
+    port = os.environ.get("FITTRACK_METRICS_PORT")
+    if not port:
+        return None
+    import metrics
+    metrics.watch_database(db)
+    metrics.registry.callback("fittrack_sessions", "Signed-in sessions", "gauge",
+                              lambda: sessions.stats()["sessions"])
+    return metrics.start_server(int(port), os.environ.get("FITTRACK_METRICS_HOST", "127.0.0.1"))
+
+get_metrics_server()
+
+# --- Custom CSS ---
+STYLESHEET_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "static", "style.css")
+STYLESHEET_URL = "app/static/style.css"  # Where Streamlit serves static/style.css
 
-def save_users(users_df):
+def static_css_supported():
     """
-    Save user credentials to CSV file with error handling.
+    Check whether Streamlit's static file server sends .css files as CSS.
+    
+    Older servers send every file type they don't list as safe as
+    text/plain, which browsers refuse to apply as a stylesheet.
     """
+    if not st.get_option("server.enableStaticServing"):
+        return False
     try:
-        # Clean the data before saving
-        users_df["Username"] = users_df["Username"].astype(str).str.strip()
-        users_df["Password"] = users_df["Password"].astype(str).str.strip()
-        users_df.to_csv(USERS_FILE, index=False)
+        from streamlit.web.server.app_static_file_handler import SAFE_APP_STATIC_FILE_EXTENSIONS
+    except ImportError:
+        # No Tornado handler: the server sends each file's real content type
         return True
-    except Exception as e:
-        st.error(f"Error saving user data: {str(e)}")
-        return False
+    return ".css" in SAFE_APP_STATIC_FILE_EXTENSIONS
+
+@st.cache_resource
+def get_stylesheet_html():
+    """
+    Build the HTML that applies the global stylesheet, once per process.
+    
+    With static serving this is a short <link> the browser fetches once and
+    caches, so reruns no longer resend the whole stylesheet. The file's
+    modification time in the URL makes browsers pick up edits. Otherwise
+    the stylesheet is inlined.
+    """
+    if static_css_supported():
+        version = int(os.path.getmtime(STYLESHEET_FILE))
+        return f'<link rel="stylesheet" href="{STYLESHEET_URL}?v={version}">'
+    with open(STYLESHEET_FILE, "r") as f:
+        return f"<style>{f.read()}</style>"
+
+st.markdown(get_stylesheet_html(), unsafe_allow_html=True)
+
+# --- Constants ---
+LEADERBOARD_FILE = "leaderboard.csv"  # File for future leaderboard feature
+IMPORT_TEMPLATE_FILE = os.path.join("templates", "weight_import_template.csv")  # Bulk import format
+SESSION_PARAM = "session"  # URL query parameter that carries the session token
+# Accounts allowed into the admin panel (backups, restores, whole-database
+# export and import). Nobody is an admin unless FITTRACK_ADMIN_USERS lists
+# them, comma-separated: sign the account up first, then add it here.
+ADMIN_USERS = frozenset(filter(None, (name.strip() for name in
+                                          os.environ.get("FITTRACK_ADMIN_USERS", "").split(","))))
+# Names nobody can take at signup, so an admin account cannot be claimed by
+# whoever registers it first
+RESERVED_USERNAMES = frozenset(name.lower() for name in ADMIN_USERS | {"admin"})
+
+# HTML for fragments redrawn on every tracker rerun. Their styling lives in
+# static/style.css, so only the values are sent each time.
+JOURNEY_PROGRESS_TEMPLATE = """<div class="journey-card">
+<div class="journey-track"><div class="journey-fill" style="width: {progress}%;"><div class="journey-shine"></div></div></div>
+<div class="journey-labels"><span>Start: {start:.1f} kg</span><span>Current: {current:.1f} kg</span><span>Goal: {goal:.1f} kg</span></div>
+<div class="journey-percent">{progress:.1f}% Complete</div>
+</div>"""
+CURRENT_LEVEL_TEMPLATE = '<div class="journey-level">Current Level: {level}</div>'
+NEXT_LEVEL_TEMPLATE = '<div class="journey-next">Next Level: {level} {icon} ({remaining:.1f}% remaining)</div>'
+EXPORT_FORMATS = {  # Label -> (format, file extension, MIME type)
+    "CSV": ("csv", "csv", "text/csv"),
+    "JSON Lines": ("jsonl", "jsonl", "application/x-ndjson"),
+    "Parquet": ("parquet", "parquet", "application/octet-stream"),
+}
+
+# --- Helper Functions ---
+def is_admin(username):
+    """
+    Check whether a user may open the admin panel.
+    
+    Args:
+        username (str): Username to check
+        
+    Returns:
+        bool: True if FITTRACK_ADMIN_USERS lists the user
+    """
+    return username in ADMIN_USERS
 
 def delete_user(username):
     """
@@ -336,16 +161,9 @@ def delete_user(username):
     Args:
         username (str): Username of the account to delete
     """
-    users_df = load_users()
-    if username in users_df["Username"].values:
-        users_df = users_df[users_df["Username"] != username]
-        save_users(users_df)
-
-        # Delete user's weight data file
-        user_file = f"weight_data_{username}.csv"
-        if os.path.exists(user_file):
-            os.remove(user_file)
-
+    # Removes the account together with all of its tracking data
+    if db.clear_user_data(username):
+        end_session(username)
         st.success("✅ Your account has been deleted successfully.")
         
         # Clear session and prevent re-login
@@ -354,33 +172,84 @@ def delete_user(username):
         
         st.rerun()
 
-def get_user_file(username):
+def start_session(username):
     """
-    Get the filename for a user's weight data.
+    Log a user in and hand the browser a session token.
+    
+    The token is kept in the URL so a refresh resumes the session
+    without asking for the password again.
     
     Args:
-        username (str): Username
-        
+        username (str): Username that just passed the credential check
+    """
+    token = sessions.create(username)
+    st.session_state["logged_in"] = True
+    st.session_state["username"] = username
+    st.session_state["session_token"] = token
+    st.query_params[SESSION_PARAM] = token
+
+def resume_session():
+    """
+    Restore the login from a session token in the URL, if it is still valid.
+    
+    Tokens are single-use: the one in the URL is revoked and replaced by a
+    fresh one, so a copied link or history entry stops working once the
+    session has been resumed.
+    
     Returns:
-        str: Filename for the user's weight data
+        bool: True if the user was logged back in.
     """
-    return f"weight_data_{username}.csv"
+    token = st.query_params.get(SESSION_PARAM)
+    if not token:
+        return False
+    username = sessions.resolve(token)
+    if username is None:
+        del st.query_params[SESSION_PARAM]
+        return False
+    sessions.revoke(token)
+    start_session(username)
+    st.session_state["just_logged_in"] = True
+    return True
 
-def get_goal_weight_file(username):
+def end_session(username=None):
+    """
+    Revoke the current session token, or every session of username.
+    
+    Args:
+        username (str, optional): Revoke all of this user's sessions,
+                                 e.g. after a password change
     """
-    Get the filename for a user's goal weight.
+    if username:
+        sessions.revoke_user(username)
+    elif st.session_state.get("session_token"):
+        sessions.revoke(st.session_state["session_token"])
+    st.session_state.pop("session_token", None)
+    if SESSION_PARAM in st.query_params:
+        del st.query_params[SESSION_PARAM]
+
+def load_weight_data(username):
+    """
+    Load a user's weight history from the database.
+    
+    The parsed frame is cached process-wide by the user's data version,
+    so switching between pages only re-queries after a write.
     
     Args:
         username (str): Username
         
     Returns:
-        str: Filename for the user's goal weight
+        pd.DataFrame: Date (datetime) and Weight columns, sorted by date.
     """
-    return f"goal_weight_{username}.txt"
+    def load():
+        df = db.get_weight_history(username).rename(columns={"date": "Date", "weight": "Weight"})
+        df["Date"] = pd.to_datetime(df["Date"])
+        return df
+
+    return db.cache.get_or_load((username, "weights"), db.data_version(username), load)
 
 def load_goal_weight(username):
     """
-    Load user's goal weight from file.
+    Load user's goal weight from the database.
     
     Args:
         username (str): Username
@@ -389,29 +258,230 @@ def load_goal_weight(username):
         float or None: Goal weight if set, None otherwise
     """
     try:
-        goal_file = get_goal_weight_file(username)
-        if os.path.exists(goal_file):
-            with open(goal_file, "r") as f:
-                return float(f.read().strip())
-        return None
+        goal = db.get_goal(username)
+        return goal[0] if goal else None
     except Exception as e:
         st.error(f"Error loading goal weight: {str(e)}")
         return None
 
 def save_goal_weight(username, goal_weight):
     """
-    Save user's goal weight to file.
+    Save user's goal weight to the database.
     
     Args:
         username (str): Username
         goal_weight (float): Goal weight to save
     """
-    try:
-        goal_file = get_goal_weight_file(username)
-        with open(goal_file, "w") as f:
-            f.write(str(round(goal_weight, 2)))
-    except Exception as e:
-        st.error(f"Error saving goal weight: {str(e)}")
+    if not db.set_goal(username, round(goal_weight, 2)):
+        st.error("Error saving goal weight")
+
+def cached_figure(username, name, build, *key):
+    """
+    Return a Plotly figure from the process-wide cache, building it on a miss.
+    
+    Figures are keyed by user, chart name, theme and any extra key values
+    (such as the goal weight), and tagged with the user's data version, so
+    reruns from unrelated widgets reuse the figure and any write rebuilds it.
+    Cached figures are shared; callers must not modify them.
+    
+    Args:
+        username (str): Username whose data the figure shows
+        name (str): Chart name
+        build (callable): Builds the figure
+        *key: Other values the figure depends on
+        
+    Returns:
+        plotly.graph_objects.Figure: The figure
+    """
+    theme = st.get_option("theme.base")
+    return db.cache.get_or_load((username, "figure", name, theme) + key,
+                                db.data_version(username), build)
+
+def build_progress_figure(df, goal_weight):
+    """
+    Build the weight progress chart for the tracker page.
+    
+    Long histories are downsampled to what the chart width can show, and
+    drawn with WebGL when that is still many points.
+    
+    Args:
+        df (pd.DataFrame): Date and Weight columns
+        goal_weight (float or None): Goal weight to draw, if set
+        
+    Returns:
+        plotly.graph_objects.Figure: The chart
+    """
+    import plotly.graph_objects as go
+    from plotly.subplots import make_subplots
+    
+    df = downsample(df, "Date", "Weight")
+    Scatter = go.Scattergl if use_webgl(len(df)) else go.Scatter
+    
+    fig = make_subplots(specs=[[{"secondary_y": False}]])
+    
+    # Add actual weight data
+    fig.add_trace(
+        Scatter(
+            x=df["Date"],
+            y=df["Weight"],
+            mode='markers+lines',
+            name='Weight',
+            line=dict(color='#00B4D8', width=2),
+            marker=dict(size=8),
+            hovertemplate="Date: %{x}<br>Weight: %{y:.2f} kg<extra></extra>"
+        )
+    )
+    
+    # Add goal weight line if set
+    if goal_weight:
+        fig.add_trace(
+            Scatter(
+                x=df["Date"],
+                y=np.full(len(df), goal_weight),
+                mode='lines',
+                name='Goal Weight',
+                line=dict(color='#FFB700', width=2, dash='dash'),
+                hovertemplate="Goal Weight: %{y:.2f} kg<extra></extra>"
+            )
+        )
+    
+    # Update layout
+    fig.update_layout(
+        title={
+            'text': "Weight Progress Over Time",
+            'y':0.95,
+            'x':0.5,
+            'xanchor': 'center',
+            'yanchor': 'top'
+        },
+        plot_bgcolor='rgba(10,25,47,0.1)',
+        paper_bgcolor='rgba(10,25,47,0)',
+        font=dict(color='#E6F1FF'),
+        xaxis=dict(
+            title="Date",
+            gridcolor='rgba(35,53,84,0.5)',
+            showgrid=True
+        ),
+        yaxis=dict(
+            title="Weight (kg)",
+            gridcolor='rgba(35,53,84,0.5)',
+            showgrid=True
+        ),
+        hovermode='x unified',
+        showlegend=True,
+        legend=dict(
+            yanchor="top",
+            y=0.99,
+            xanchor="left",
+            x=0.01
+        )
+    )
+    
+    return fig
+
+def build_trend_figure(trend_data):
+    """
+    Build the weight trend chart for the Data for Nerds page.
+    
+    Long histories are downsampled and drawn like the progress chart.
+    
+    Args:
+        trend_data (dict): Output of calculate_trend_analysis
+        
+    Returns:
+        plotly.graph_objects.Figure: The chart
+    """
+    import plotly.graph_objects as go
+    from plotly.subplots import make_subplots
+    
+    points = downsample(pd.DataFrame({
+        'dates': trend_data['dates'].values,
+        'weights': trend_data['weights'].values,
+        'trend_line': trend_data['trend_line'],
+    }), 'dates', 'weights')
+    Scatter = go.Scattergl if use_webgl(len(points)) else go.Scatter
+    
+    fig = make_subplots(specs=[[{"secondary_y": False}]])
+    
+    # Add actual weight data
+    fig.add_trace(
+        Scatter(
+            x=points['dates'],
+            y=points['weights'],
+            mode='markers+lines',
+            name='Weight',
+            line=dict(color='#00B4D8', width=2),
+            marker=dict(size=8),
+            hovertemplate="Date: %{x}<br>Weight: %{y:.2f} kg<extra></extra>"
+        )
+    )
+    
+    # Add trend line
+    fig.add_trace(
+        Scatter(
+            x=points['dates'],
+            y=points['trend_line'],
+            mode='lines',
+            name='Trend',
+            line=dict(color='#FFB700', width=2, dash='dash'),
+            hovertemplate="Date: %{x}<br>Trend: %{y:.2f} kg<extra></extra>"
+        )
+    )
+    
+    # Update layout
+    fig.update_layout(
+        title={
+            'text': "Weight Trend Analysis",
+            'y':0.95,
+            'x':0.5,
+            'xanchor': 'center',
+            'yanchor': 'top'
+        },
+        plot_bgcolor='rgba(10,25,47,0.1)',
+        paper_bgcolor='rgba(10,25,47,0)',
+        font=dict(color='#E6F1FF'),
+        xaxis=dict(
+            title="Date",
+            gridcolor='rgba(35,53,84,0.5)',
+            showgrid=True
+        ),
+        yaxis=dict(
+            title="Weight (kg)",
+            gridcolor='rgba(35,53,84,0.5)',
+            showgrid=True
+        ),
+        hovermode='x unified',
+        showlegend=True,
+        legend=dict(
+            yanchor="top",
+            y=0.99,
+            xanchor="left",
+            x=0.01
+        )
+    )
+    
+    return fig
+
+def build_history_figure(weight_history):
+    """
+    Build the simple weight history chart.
+    
+    Args:
+        weight_history (pd.DataFrame): date and weight columns
+        
+    Returns:
+        plotly.graph_objects.Figure: The chart
+    """
+    import plotly.graph_objects as go
+    
+    points = downsample(weight_history.assign(date=pd.to_datetime(weight_history['date'])),
+                        'date', 'weight')
+    Scatter = go.Scattergl if use_webgl(len(points)) else go.Scatter
+    
+    fig = go.Figure()
+    fig.add_trace(Scatter(x=points['date'], y=points['weight'],
+                          mode='lines+markers', name='Weight'))
+    return fig
 
 def estimate_time_to_goal(username, goal_weight, df):
     """
@@ -452,21 +522,48 @@ def estimate_time_to_goal(username, goal_weight, df):
     except Exception as e:
         return f"Error calculating time estimate: {str(e)}"
 
-def load_goggins_image(is_login=True):
+@st.cache_resource
+def render_image(filename, width):
+    """
+    Decode an image once per process and pre-render it at its display width.
+    
+    JPEG at exactly the width st.image is given passes through Streamlit
+    untouched, and identical bytes get the same media URL on every rerun,
+    so the browser keeps its cached copy.
+    
+    Args:
+        filename (str): Image file to load
+        width (int): Display width in pixels
+    
+    Returns:
+        bytes: Optimized progressive JPEG
     """
-    Load and return the David Goggins motivational image from local file.
+    from PIL import Image
+    
+    with Image.open(filename) as img:
+        img = img.convert("RGB")
+        if img.width > width:
+            height = round(img.height * width / img.width)
+            img = img.resize((width, height), Image.LANCZOS)
+        buffer = BytesIO()
+        img.save(buffer, format="JPEG", quality=85, optimize=True, progressive=True)
+    return buffer.getvalue()
+
+def load_goggins_image(is_login=True, width=300):
+    """
+    Load the David Goggins motivational image, decoded and resized once.
     
     Args:
         is_login (bool): If True, loads goggins1.jpg for login page, else goggins2.jpg
+        width (int): Width the image is displayed at
     
     Returns:
-        PIL.Image: The loaded image, or None if the image cannot be loaded
+        bytes: The image as JPEG, or None if the image cannot be loaded
     """
     try:
         # Load the appropriate image based on the page
         filename = "goggins1.jpg" if is_login else "goggins2.jpg"
-        img = Image.open(filename)
-        return img
+        return render_image(filename, width)
     except Exception as e:
         st.error(f"Error loading image: {str(e)}")
         return None
@@ -492,8 +589,6 @@ def signup_page():
         </div>
     """, unsafe_allow_html=True)
     
-    users_df = load_users()
-    
     # Create a form for signup with improved styling
     st.markdown("""
         <div class="login-form" style="max-width: 600px; margin: 0 auto;">
@@ -515,18 +610,19 @@ def signup_page():
             submitted = st.form_submit_button("Create Account", use_container_width=True)
         
         if submitted:
+            new_username = new_username.strip()
+            new_password = new_password.strip()
             if len(new_username) < 3 or len(new_password) < 4:
                 st.error("Username must be at least 3 characters and password at least 4 characters long!")
-            elif new_username in users_df["Username"].values:
+            elif new_username.lower() in RESERVED_USERNAMES:
+                st.error("This username is reserved. Choose another.")
+            elif not db.add_user(new_username, new_password):
                 st.error("Username already exists! Choose another.")
             else:
-                new_user = pd.DataFrame([[new_username, new_password]], columns=["Username", "Password"])
-                users_df = pd.concat([users_df, new_user], ignore_index=True)
-                if save_users(users_df):
-                    st.success("✅ Account created successfully! Redirecting to login...")
-                    st.session_state["show_signup"] = False
-                    time.sleep(2)
-                    st.rerun()
+                st.success("✅ Account created successfully! Redirecting to login...")
+                st.session_state["show_signup"] = False
+                time.sleep(2)
+                st.rerun()
     
     # Back to login button with improved spacing
     st.markdown('<div style="margin-top: 1.5rem;">', unsafe_allow_html=True)
@@ -562,8 +658,6 @@ def login_page():
             </div>
         """, unsafe_allow_html=True)
 
-        users_df = load_users()
-        
         # Create a form for login with improved styling
         with st.form("login_form", clear_on_submit=False):
             username = st.text_input("Username", 
@@ -590,23 +684,15 @@ def login_page():
                     username = str(username).strip()
                     password = str(password).strip()
                     
-                    # Load users
-                    users_df = load_users()
-                    
-                    # Check credentials
-                    user_match = users_df[users_df["Username"] == username]
-                    
-                    if not user_match.empty:
-                        stored_password = user_match["Password"].iloc[0]
-                        if stored_password == password:
-                            st.success("✅ Login successful! Redirecting...")
-                            st.session_state["logged_in"] = True
-                            st.session_state["username"] = username
-                            st.session_state["just_logged_in"] = True
-                            time.sleep(1)
-                            st.rerun()
-                        else:
-                            st.error("Invalid password.")
+                    # Check credentials with a primary key lookup
+                    if db.verify_user(username, password):
+                        st.success("✅ Login successful! Redirecting...")
+                        start_session(username)
+                        st.session_state["just_logged_in"] = True
+                        time.sleep(1)
+                        st.rerun()
+                    elif db.user_exists(username):
+                        st.error("Invalid password.")
                     else:
                         st.error(f"Username '{username}' not found.")
         
@@ -623,13 +709,370 @@ def login_page():
             <div style="display: flex; flex-direction: column; align-items: center; margin-top: 2rem;">
         """, unsafe_allow_html=True)
         
-        goggins_img = load_goggins_image(is_login=True)
+        goggins_img = load_goggins_image(is_login=True, width=250)
         if goggins_img:
             st.image(goggins_img, width=250, caption="GET AFTER IT!")
         
         st.markdown('</div>', unsafe_allow_html=True)
 
 # --- Main Application ---
+# --- Fitness Tracker Panels ---
+# The tracker's interactive panels are fragments: using a widget inside one
+# reruns just that panel instead of the whole page. A fragment rerun reuses
+# the arguments of the last full run, so panels take only the username and
+# read their data through the version-keyed loaders, which keeps them fresh.
+# A write reruns what depends on it: new or deleted entries feed every panel
+# and the quick stats, so they rerun the app; the goal only feeds the
+# progress chart and milestones, so saving it reruns that panel alone.
+def timed_fragment(func):
+    """
+    Turn func into a fragment whose reruns are timed like pages.
+    
+    Args:
+        func (callable): Panel function
+        
+    Returns:
+        callable: The fragment
+    """
+    @st.fragment
+    @functools.wraps(func)
+    def fragment(*args, **kwargs):
+        with timings.timer("fragment", func.__name__):
+            return func(*args, **kwargs)
+    return fragment
+
+def rerun_fragment():
+    """
+    Rerun only the fragment being drawn. Streamlit refuses fragment-scoped
+    reruns while a fragment draws as part of a full run; the app is rerun then.
+    """
+    try:
+        st.rerun(scope="fragment")
+    except StreamlitAPIException:
+        st.rerun()
+
+def load_weight_table(username):
+    """
+    Load a user's weight history formatted for the history table.
+    
+    Formatting every date is the slow part of drawing a long history, so
+    the formatted frame is cached by data version like the raw one.
+    
+    Args:
+        username (str): Username
+        
+    Returns:
+        pd.DataFrame: Date (text), Weight and Weight Difference columns
+    """
+    def build():
+        df = load_weight_data(username)
+        df["Date"] = df["Date"].dt.strftime('%d %B %Y')
+        df["Weight"] = df["Weight"].round(2)
+        df["Weight Difference"] = df["Weight"].diff().fillna(0).round(2)
+        return df
+
+    return db.cache.get_or_load((username, "weights_table"), db.data_version(username), build)
+
+@timed_fragment
+def weight_entry_panel(username):
+    """
+    Date picker and weight input for adding an entry.
+    
+    Moving between dates reruns only this panel. Saving an entry reruns
+    the app, since every other panel shows the entries.
+    
+    Args:
+        username (str): Current user's username
+    """
+    # Weight Entry Section
+    st.markdown('<div id="add_weight"></div>', unsafe_allow_html=True)
+    st.markdown("""
+        <div class="section-container">
+            <h2>➕ Add Your Weight Entry</h2>
+            <div style="max-width: 500px; margin: 0 auto;">
+    """, unsafe_allow_html=True)
+    
+    # Reset selected_date to current date on page load/refresh
+    if "selected_date" not in st.session_state or st.session_state.get("just_logged_in", False):
+        st.session_state.selected_date = datetime.now().date()
+        st.session_state.just_logged_in = False
+
+    # Date Selection with improved layout
+    st.markdown('<div class="date-container">', unsafe_allow_html=True)
+    date_col1, date_col2, date_col3 = st.columns([0.2, 2, 0.2])
+    with date_col1:
+        if st.button("◀", key="prev_day_btn", help="Previous Day", use_container_width=True):
+            st.session_state.selected_date = st.session_state.selected_date - timedelta(days=1)
+            rerun_fragment()
+    with date_col2:
+        st.markdown('<div class="date-input">', unsafe_allow_html=True)
+        try:
+            selected_date = st.date_input("Select Date", 
+                                        value=st.session_state.selected_date,
+                                        min_value=None,
+                                        max_value=None,
+                                        label_visibility="collapsed",
+                                        key="date_selector")
+            st.session_state.selected_date = selected_date
+            formatted_date = selected_date.strftime("%d %B %Y")
+            st.markdown(f'<h3 style="text-align: center;">{formatted_date}</h3>', unsafe_allow_html=True)
+        except Exception as e:
+            st.error(f"Invalid date format: {str(e)}")
+            selected_date = datetime.now().date()
+    with date_col3:
+        if st.button("▶", key="next_day_btn", help="Next Day", use_container_width=True):
+            next_date = st.session_state.selected_date + timedelta(days=1)
+            st.session_state.selected_date = next_date
+            rerun_fragment()
+    st.markdown('</div>', unsafe_allow_html=True)
+
+    # Weight Input with improved layout
+    col1, col2, col3 = st.columns([1, 2, 1])
+    with col2:
+        st.markdown('<div class="weight-input">', unsafe_allow_html=True)
+        try:
+            new_weight = st.number_input("Weight (kg)", 
+                                       min_value=30.0,
+                                       max_value=200.0, 
+                                       step=0.05,
+                                       format="%.2f",
+                                       value=70.0,
+                                       label_visibility="visible")
+        except Exception as e:
+            st.error(f"Invalid weight value: {str(e)}")
+            new_weight = 70.0
+        st.markdown('</div>', unsafe_allow_html=True)
+
+        if st.button("Add Entry", key="add_entry_btn", use_container_width=True):
+            try:
+                # Format the date
+                selected_date_str = selected_date.strftime("%Y-%m-%d")
+                
+                # Indexed lookup of the existing entry for this date
+                if db.get_weight_entry(username, selected_date_str) is not None:
+                    st.warning("Entry exists for this date. It will be updated.")
+                
+                # Upsert only this day's row
+                if db.add_weight_entry(username, selected_date_str, new_weight):
+                    st.success("✅ Weight entry added!")
+                    time.sleep(1)
+                    st.rerun()
+                else:
+                    st.error("Failed to save weight entry. Please try again.")
+            except Exception as e:
+                st.error(f"Error adding entry: {str(e)}")
+    
+    st.markdown("</div></div>", unsafe_allow_html=True)
+
+@timed_fragment
+def weight_history_panel(username):
+    """
+    Table of every weight entry.
+    
+    Args:
+        username (str): Current user's username
+    """
+    # Data Display Section
+    st.markdown('<div id="view_data"></div>', unsafe_allow_html=True)
+    st.markdown("""
+        <div class="section-container">
+            <h2>📊 Your Weight Data</h2>
+    """, unsafe_allow_html=True)
+    
+    try:
+        display_df = load_weight_table(username)
+        if not display_df.empty:
+            st.dataframe(display_df, use_container_width=True)
+        else:
+            st.info("No weight entries yet. Add your first entry above!")
+    except Exception as e:
+        st.error(f"Error displaying data: {str(e)}")
+    
+    st.markdown("</div>", unsafe_allow_html=True)
+
+@timed_fragment
+def progress_chart_panel(username):
+    """
+    Weight progress chart. Narrowing its date range reruns only the chart.
+    
+    Args:
+        username (str): Current user's username
+    """
+    df = load_weight_data(username)
+
+    # Progress Graph Section
+    st.markdown('<div id="progress"></div>', unsafe_allow_html=True)
+    st.markdown("""
+        <div class="section-container">
+            <h2>📈 Weight Progress Over Time</h2>
+    """, unsafe_allow_html=True)
+    
+    if not df.empty:
+        try:
+            # Long histories are downsampled for drawing; narrowing the
+            # date range brings back every point in it
+            chart_df = df
+            window = None
+            if len(df) > point_budget():
+                first_date, last_date = df["Date"].min().date(), df["Date"].max().date()
+                window = st.slider("Date range", min_value=first_date, max_value=last_date,
+                                   value=(first_date, last_date), key="progress_range")
+                chart_df = df[(df["Date"] >= pd.Timestamp(window[0]))
+                              & (df["Date"] <= pd.Timestamp(window[1]))]
+            
+            # Reuse the figure until the data, goal, range or theme changes
+            goal_weight = load_goal_weight(username)
+            fig = cached_figure(username, "progress",
+                                lambda: build_progress_figure(chart_df, goal_weight),
+                                goal_weight, window)
+            
+            # Display the plot
+            st.plotly_chart(fig, use_container_width=True)
+            
+        except Exception as e:
+            st.error(f"Error creating graph: {str(e)}")
+    
+    st.markdown("</div>", unsafe_allow_html=True)
+
+@timed_fragment
+def progress_and_goal_panel(username):
+    """
+    Progress chart, goal weight input and milestones, which all depend on
+    the goal. Saving a goal reruns this panel only.
+    
+    Args:
+        username (str): Current user's username
+    """
+    progress_chart_panel(username)
+    df = load_weight_data(username)
+
+    # Goal Weight Section
+    st.markdown('<div id="goal"></div>', unsafe_allow_html=True)
+    st.markdown("""
+        <div class="section-container">
+            <h2>🎯 Set Your Goal Weight</h2>
+    """, unsafe_allow_html=True)
+    
+    current_goal = load_goal_weight(username)
+    goal_weight = st.number_input("Enter your goal weight (kg)", 
+                                min_value=30.0, 
+                                max_value=200.0, 
+                                step=0.1, 
+                                value=current_goal or 70.0)
+
+    if st.button("Save Goal Weight", key="save_goal_btn", use_container_width=True):
+        try:
+            save_goal_weight(username, goal_weight)
+            st.success("✅ Goal weight saved successfully!")
+            time.sleep(1)  # Brief pause for user feedback
+            rerun_fragment()
+        except Exception as e:
+            st.error(f"Error saving goal weight: {str(e)}")
+
+    if current_goal and not df.empty:
+        with st.expander("View Weight Loss Progress"):
+            # Calculate progress
+            current_weight = df["Weight"].iloc[-1]
+            starting_weight = df["Weight"].iloc[0]
+            total_to_lose = starting_weight - current_goal
+            current_progress = starting_weight - current_weight
+            progress_percentage = min(100, max(0, (current_progress / total_to_lose) * 100))
+            
+            # Calculate milestones
+            milestones = {
+                25: ("Bronze", "🥉"),
+                50: ("Silver", "🥈"),
+                75: ("Gold", "🥇"),
+                100: ("Champion", "🏆")
+            }
+            
+            # Determine current level and next milestone
+            current_level = None
+            next_milestone = None
+            for threshold, (level, icon) in sorted(milestones.items()):
+                if progress_percentage >= threshold:
+                    current_level = level
+                else:
+                    next_milestone = (threshold, level, icon)
+                    break
+            
+            # Display progress bar with gamification elements
+            st.markdown("""
+                <div style="text-align: center; margin: 1.5rem 0;">
+                    <h3>Your Weight Loss Journey</h3>
+            """, unsafe_allow_html=True)
+            
+            # Progress bar container, styled by static/style.css
+            st.markdown(JOURNEY_PROGRESS_TEMPLATE.format(
+                progress=progress_percentage, start=starting_weight,
+                current=current_weight, goal=current_goal), unsafe_allow_html=True)
+            
+            # Display current level and next milestone
+            if current_level:
+                st.markdown(CURRENT_LEVEL_TEMPLATE.format(level=current_level),
+                            unsafe_allow_html=True)
+            
+            if next_milestone:
+                threshold, level, icon = next_milestone
+                remaining_percentage = threshold - progress_percentage
+                st.markdown(NEXT_LEVEL_TEMPLATE.format(
+                    level=level, icon=icon, remaining=remaining_percentage),
+                    unsafe_allow_html=True)
+            
+            st.markdown("</div>", unsafe_allow_html=True)
+            
+            estimated_time = estimate_time_to_goal(username, current_goal, df)
+            st.write(estimated_time)
+
+@timed_fragment
+def delete_entry_panel(username):
+    """
+    Delete a single weight entry, with confirmation.
+    
+    Picking a date and confirming rerun only this panel; deleting reruns
+    the app, since every other panel shows the entries.
+    
+    Args:
+        username (str): Current user's username
+    """
+    delete_date = st.date_input("Select date to delete entry", key="delete_date")
+    
+    if "confirm_delete_entry_state" not in st.session_state:
+        st.session_state.confirm_delete_entry_state = False
+        
+    if st.button("Delete Selected Entry", key="delete_entry_btn", use_container_width=True):
+        try:
+            # Convert delete_date to string format
+            delete_date_str = delete_date.strftime("%Y-%m-%d")
+            
+            # Indexed lookup of the entry for this date
+            if db.get_weight_entry(username, delete_date_str) is not None:
+                st.session_state.confirm_delete_entry_state = True
+                st.warning(f"Are you sure you want to delete the entry for {delete_date.strftime('%d %B %Y')}?")
+            else:
+                st.warning("No entry found for the selected date.")
+        except Exception as e:
+            st.error(f"Error checking date: {str(e)}")
+            
+    if st.session_state.confirm_delete_entry_state:
+        col1, col2 = st.columns([1, 1])
+        with col1:
+            if st.button("Yes, Delete", key="confirm_delete_entry", use_container_width=True):
+                try:
+                    delete_date_str = delete_date.strftime("%Y-%m-%d")
+                    if db.delete_weight_entry(username, delete_date_str):
+                        st.success(f"Entry for {delete_date.strftime('%d %B %Y')} deleted!")
+                        st.session_state.confirm_delete_entry_state = False
+                        time.sleep(1)
+                        st.rerun()
+                except Exception as e:
+                    st.error(f"Error deleting entry: {str(e)}")
+                    st.session_state.confirm_delete_entry_state = False
+        with col2:
+            if st.button("Cancel", key="cancel_delete_entry", use_container_width=True):
+                st.session_state.confirm_delete_entry_state = False
+                rerun_fragment()
+
 def fitness_tracker(username):
     """
     Main fitness tracking interface.
@@ -678,6 +1121,12 @@ def fitness_tracker(username):
         if st.button("🤓 Data for Nerds", key="data_nerds_btn", use_container_width=True):
             st.session_state["show_data_nerds"] = True
             st.rerun()
+
+        # Backups, exports and performance timings for the admins
+        if is_admin(username):
+            if st.button("🛠️ Admin Panel", key="admin_panel_btn", use_container_width=True):
+                st.session_state["show_admin_panel"] = True
+                st.rerun()
             
         st.markdown("---")
         
@@ -716,17 +1165,13 @@ def fitness_tracker(username):
                 elif len(new_password) < 4:
                     st.error("New password must be at least 4 characters long.")
                 else:
-                    users_df = load_users()
-                    user_row = users_df[users_df["Username"] == username]
-                    
-                    if not user_row.empty and user_row["Password"].iloc[0] == current_password:
-                        # Update the password in the DataFrame
-                        users_df.loc[users_df["Username"] == username, "Password"] = new_password
-                        
-                        # Save the updated DataFrame
-                        success = save_users(users_df)
+                    if db.verify_user(username, current_password.strip()):
+                        # Single-row update of the stored password
+                        success = db.update_password(username, new_password.strip())
                         
                         if success:
+                            # Sessions started with the old password end here
+                            end_session(username)
                             st.success("✅ Password updated successfully! Please login again with your new password.")
                             # Add a small delay to show the success message
                             time.sleep(2)
@@ -758,22 +1203,9 @@ def fitness_tracker(username):
                 col1, col2 = st.columns(2)
                 with col1:
                     if st.button("Yes, Delete", key="confirm_delete_btn", use_container_width=True):
-                        users_df = load_users()
-                        if username in users_df["Username"].values:
-                            # Remove user from users DataFrame
-                            users_df = users_df[users_df["Username"] != username]
-                            save_users(users_df)
-                            
-                            # Delete user's weight data file
-                            user_file = f"weight_data_{username}.csv"
-                            if os.path.exists(user_file):
-                                os.remove(user_file)
-                                
-                            # Delete user's goal weight file if it exists
-                            goal_file = f"goal_weight_{username}.txt"
-                            if os.path.exists(goal_file):
-                                os.remove(goal_file)
-                            
+                        # Delete the account with its weight, goal and profile data
+                        if db.clear_user_data(username):
+                            end_session(username)
                             st.success("✅ Account deleted successfully!")
                             time.sleep(2)
                             
@@ -795,6 +1227,7 @@ def fitness_tracker(username):
         # Logout button with improved styling
         st.markdown('<div style="padding: 1rem 0;">', unsafe_allow_html=True)
         if st.button("🚪 Logout", key="logout_btn", use_container_width=True):
+            end_session()
             st.session_state["logged_in"] = False
             st.session_state.pop("username")
             st.rerun()
@@ -839,20 +1272,9 @@ def fitness_tracker(username):
             </div>
         """, unsafe_allow_html=True)
 
-        # Load and prepare user data
-        data_file = get_user_file(username)
+        # Load user data
         try:
-            df = pd.read_csv(data_file)
-            df["Date"] = pd.to_datetime(df["Date"])
-            df["Weight"] = df["Weight"].round(2)
-            df = df.drop_duplicates(subset=["Date"], keep="last")
-            df = df.sort_values("Date")
-            try:
-                df.to_csv(data_file, index=False)
-            except Exception as e:
-                st.error(f"Error saving data: {str(e)}")
-        except FileNotFoundError:
-            df = pd.DataFrame(columns=["Date", "Weight"])
+            df = load_weight_data(username)
         except Exception as e:
             st.error(f"Error loading data: {str(e)}")
             df = pd.DataFrame(columns=["Date", "Weight"])
@@ -870,353 +1292,72 @@ def fitness_tracker(username):
                 st.metric("Total Change", f"{weight_change:+.1f} kg")
             st.markdown('<div style="margin: 2rem 0;"></div>', unsafe_allow_html=True)  # Add bottom spacing
         
-        # Weight Entry Section
-        st.markdown('<div id="add_weight"></div>', unsafe_allow_html=True)
-        st.markdown("""
-            <div class="section-container">
-                <h2>➕ Add Your Weight Entry</h2>
-                <div style="max-width: 500px; margin: 0 auto;">
-        """, unsafe_allow_html=True)
-        
-        # Reset selected_date to current date on page load/refresh
-        if "selected_date" not in st.session_state or st.session_state.get("just_logged_in", False):
-            st.session_state.selected_date = datetime.now().date()
-            st.session_state.just_logged_in = False
-
-        # Date Selection with improved layout
-        st.markdown('<div class="date-container">', unsafe_allow_html=True)
-        date_col1, date_col2, date_col3 = st.columns([0.2, 2, 0.2])
-        with date_col1:
-            if st.button("◀", key="prev_day_btn", help="Previous Day", use_container_width=True):
-                st.session_state.selected_date = st.session_state.selected_date - timedelta(days=1)
-                st.rerun()
-        with date_col2:
-            st.markdown('<div class="date-input">', unsafe_allow_html=True)
-            try:
-                selected_date = st.date_input("Select Date", 
-                                            value=st.session_state.selected_date,
-                                            min_value=None,
-                                            max_value=None,
-                                            label_visibility="collapsed",
-                                            key="date_selector")
-                st.session_state.selected_date = selected_date
-                formatted_date = selected_date.strftime("%d %B %Y")
-                st.markdown(f'<h3 style="text-align: center;">{formatted_date}</h3>', unsafe_allow_html=True)
-            except Exception as e:
-                st.error(f"Invalid date format: {str(e)}")
-                selected_date = datetime.now().date()
-        with date_col3:
-            if st.button("▶", key="next_day_btn", help="Next Day", use_container_width=True):
-                next_date = st.session_state.selected_date + timedelta(days=1)
-                st.session_state.selected_date = next_date
-                st.rerun()
-        st.markdown('</div>', unsafe_allow_html=True)
-
-        # Weight Input with improved layout
-        col1, col2, col3 = st.columns([1, 2, 1])
-        with col2:
-            st.markdown('<div class="weight-input">', unsafe_allow_html=True)
-            try:
-                new_weight = st.number_input("Weight (kg)", 
-                                           min_value=30.0,
-                                           max_value=200.0, 
-                                           step=0.05,
-                                           format="%.2f",
-                                           value=70.0,
-                                           label_visibility="visible")
-            except Exception as e:
-                st.error(f"Invalid weight value: {str(e)}")
-                new_weight = 70.0
-            st.markdown('</div>', unsafe_allow_html=True)
-
-            if st.button("Add Entry", key="add_entry_btn", use_container_width=True):
-                try:
-                    # Format the date
-                    selected_date_str = selected_date.strftime("%Y-%m-%d")
-                    
-                    # Create or load the DataFrame
-                    if df.empty:
-                        df = pd.DataFrame(columns=["Date", "Weight"])
-                    
-                    # Convert existing dates to string format for comparison
-                    existing_dates = df["Date"].dt.strftime("%Y-%m-%d").values if not df.empty else []
-                    
-                    # Update or add new entry
-                    if selected_date_str in existing_dates:
-                        st.warning("Entry exists for this date. It will be updated.")
-                        df.loc[df["Date"].dt.strftime("%Y-%m-%d") == selected_date_str, "Weight"] = round(new_weight, 2)
-                    else:
-                        new_entry = pd.DataFrame({
-                            "Date": [pd.to_datetime(selected_date_str)],
-                            "Weight": [round(new_weight, 2)]
-                        })
-                        df = pd.concat([df, new_entry], ignore_index=True)
-                    
-                    # Save the entry
-                    if save_weight_entry(username, df, data_file):
-                        st.success("✅ Weight entry added!")
-                        time.sleep(1)
-                        st.rerun()
-                    else:
-                        st.error("Failed to save weight entry. Please try again.")
-                except Exception as e:
-                    st.error(f"Error adding entry: {str(e)}")
-        
-        st.markdown("</div></div>", unsafe_allow_html=True)
+        # Each panel is a fragment, so its own widgets rerun only that panel
+        weight_entry_panel(username)
+        weight_history_panel(username)
+        progress_and_goal_panel(username)
 
-        # Data Display Section
-        st.markdown('<div id="view_data"></div>', unsafe_allow_html=True)
+        # Data Management Section
         st.markdown("""
             <div class="section-container">
-                <h2>📊 Your Weight Data</h2>
+                <h2>⚙️ Data Management</h2>
         """, unsafe_allow_html=True)
-        
-        if not df.empty:
-            try:
-                df["Date"] = pd.to_datetime(df["Date"]).dt.strftime('%d %B %Y')
-                df["Weight"] = df["Weight"].round(2)
-                df["Weight Difference"] = df["Weight"].diff().fillna(0).round(2)
-                st.dataframe(df, use_container_width=True)
-            except Exception as e:
-                st.error(f"Error displaying data: {str(e)}")
-        else:
-            st.info("No weight entries yet. Add your first entry above!")
-        
-        st.markdown("</div>", unsafe_allow_html=True)
 
-        # Progress Graph Section
-        st.markdown('<div id="progress"></div>', unsafe_allow_html=True)
+        # Bulk Import Section
         st.markdown("""
-            <div class="section-container">
-                <h2>📈 Weight Progress Over Time</h2>
+            <div style="margin-bottom: 2rem;">
+                <h3>📥 Import Weight History</h3>
         """, unsafe_allow_html=True)
-        
-        if not df.empty:
+
+        with st.expander("Import from CSV"):
+            st.write("Upload a CSV with `Date` (YYYY-MM-DD) and `Weight` (kg) columns. "
+                     "Existing entries on the same dates are updated.")
             try:
-                # Create interactive plot using plotly
-                fig = make_subplots(specs=[[{"secondary_y": False}]])
-                
-                # Add actual weight data
-                fig.add_trace(
-                    go.Scatter(
-                        x=df["Date"],
-                        y=df["Weight"],
-                        mode='markers+lines',
-                        name='Weight',
-                        line=dict(color='#00B4D8', width=2),
-                        marker=dict(size=8),
-                        hovertemplate="Date: %{x}<br>Weight: %{y:.2f} kg<extra></extra>"
-                    )
-                )
-                
-                # Add goal weight line if set
-                goal_weight = load_goal_weight(username)
-                if goal_weight:
-                    fig.add_trace(
-                        go.Scatter(
-                            x=df["Date"],
-                            y=[goal_weight] * len(df["Date"]),
-                            mode='lines',
-                            name='Goal Weight',
-                            line=dict(color='#FFB700', width=2, dash='dash'),
-                            hovertemplate="Goal Weight: %{y:.2f} kg<extra></extra>"
-                        )
-                    )
-                
-                # Update layout
-                fig.update_layout(
-                    title={
-                        'text': "Weight Progress Over Time",
-                        'y':0.95,
-                        'x':0.5,
-                        'xanchor': 'center',
-                        'yanchor': 'top'
-                    },
-                    plot_bgcolor='rgba(10,25,47,0.1)',
-                    paper_bgcolor='rgba(10,25,47,0)',
-                    font=dict(color='#E6F1FF'),
-                    xaxis=dict(
-                        title="Date",
-                        gridcolor='rgba(35,53,84,0.5)',
-                        showgrid=True
-                    ),
-                    yaxis=dict(
-                        title="Weight (kg)",
-                        gridcolor='rgba(35,53,84,0.5)',
-                        showgrid=True
-                    ),
-                    hovermode='x unified',
-                    showlegend=True,
-                    legend=dict(
-                        yanchor="top",
-                        y=0.99,
-                        xanchor="left",
-                        x=0.01
-                    )
-                )
-                
-                # Display the plot
-                st.plotly_chart(fig, use_container_width=True)
-                
-            except Exception as e:
-                st.error(f"Error creating graph: {str(e)}")
-        
+                with open(IMPORT_TEMPLATE_FILE, "rb") as f:
+                    st.download_button("Download Template", data=f.read(),
+                                       file_name="weight_import_template.csv",
+                                       mime="text/csv", key="import_template_btn")
+            except FileNotFoundError:
+                pass
+            import_file = st.file_uploader("Choose a CSV file", type=["csv"], key="weight_import_file")
+            if import_file is not None and st.button("Import Entries", key="import_entries_btn",
+                                                     use_container_width=True):
+                progress_text = st.empty()
+                result = db.import_weight_csv(
+                    username, import_file,
+                    progress_callback=lambda read, imported: progress_text.text(
+                        f"Processed {read:,} rows, imported {imported:,}..."))
+                if result is None:
+                    st.error("Import failed. Make sure the file has Date and Weight columns.")
+                elif result['imported'] == 0:
+                    progress_text.empty()
+                    st.warning(f"No valid entries found ({result['skipped']:,} invalid rows skipped).")
+                else:
+                    progress_text.empty()
+                    st.success(f"✅ Imported {result['imported']:,} entries "
+                               f"({result['skipped']:,} invalid rows skipped).")
+                    time.sleep(1)
+                    st.rerun()
+
         st.markdown("</div>", unsafe_allow_html=True)
 
-        # Goal Weight Section
-        st.markdown('<div id="goal"></div>', unsafe_allow_html=True)
+        # Export Section
         st.markdown("""
-            <div class="section-container">
-                <h2>🎯 Set Your Goal Weight</h2>
+            <div style="margin-bottom: 2rem;">
+                <h3>📤 Export My Data</h3>
         """, unsafe_allow_html=True)
-        
-        current_goal = load_goal_weight(username)
-        goal_weight = st.number_input("Enter your goal weight (kg)", 
-                                    min_value=30.0, 
-                                    max_value=200.0, 
-                                    step=0.1, 
-                                    value=current_goal or 70.0)
 
-        if st.button("Save Goal Weight", key="save_goal_btn", use_container_width=True):
-            try:
-                save_goal_weight(username, goal_weight)
-                st.success("✅ Goal weight saved successfully!")
-                time.sleep(1)  # Brief pause for user feedback
-                st.rerun()
-            except Exception as e:
-                st.error(f"Error saving goal weight: {str(e)}")
-
-        if current_goal and not df.empty:
-            with st.expander("View Weight Loss Progress"):
-                # Calculate progress
-                current_weight = df["Weight"].iloc[-1]
-                starting_weight = df["Weight"].iloc[0]
-                total_to_lose = starting_weight - current_goal
-                current_progress = starting_weight - current_weight
-                progress_percentage = min(100, max(0, (current_progress / total_to_lose) * 100))
-                
-                # Calculate milestones
-                milestones = {
-                    25: ("Bronze", "🥉"),
-                    50: ("Silver", "🥈"),
-                    75: ("Gold", "🥇"),
-                    100: ("Champion", "🏆")
-                }
-                
-                # Determine current level and next milestone
-                current_level = None
-                next_milestone = None
-                for threshold, (level, icon) in sorted(milestones.items()):
-                    if progress_percentage >= threshold:
-                        current_level = level
-                    else:
-                        next_milestone = (threshold, level, icon)
-                        break
-                
-                # Display progress bar with gamification elements
-                st.markdown("""
-                    <div style="text-align: center; margin: 1.5rem 0;">
-                        <h3>Your Weight Loss Journey</h3>
-                """, unsafe_allow_html=True)
-                
-                # Progress bar container with custom styling
-                st.markdown(f"""
-                    <div style="
-                        background: var(--secondary-bg);
-                        border-radius: 12px;
-                        padding: 1.5rem;
-                        margin: 1rem 0;
-                        border: 2px solid var(--border-color);
-                    ">
-                        <div style="
-                            background: var(--background-color);
-                            height: 30px;
-                            border-radius: 15px;
-                            overflow: hidden;
-                            position: relative;
-                            margin: 1rem 0;
-                        ">
-                            <div style="
-                                background: var(--gradient);
-                                height: 100%;
-                                width: {progress_percentage}%;
-                                transition: width 0.5s ease;
-                                position: relative;
-                                overflow: hidden;
-                            ">
-                                <div style="
-                                    position: absolute;
-                                    top: 0;
-                                    left: 0;
-                                    right: 0;
-                                    bottom: 0;
-                                    background: linear-gradient(90deg, 
-                                        rgba(255,255,255,0) 0%,
-                                        rgba(255,255,255,0.2) 50%,
-                                        rgba(255,255,255,0) 100%);
-                                    animation: shine 2s infinite;
-                                "></div>
-                            </div>
-                        </div>
-                        <div style="
-                            display: flex;
-                            justify-content: space-between;
-                            margin: 0.5rem 0;
-                            font-size: 0.9rem;
-                            color: var(--text-color);
-                            opacity: 0.8;
-                        ">
-                            <span>Start: {starting_weight:.1f} kg</span>
-                            <span>Current: {current_weight:.1f} kg</span>
-                            <span>Goal: {current_goal:.1f} kg</span>
-                        </div>
-                        <div style="
-                            font-size: 1.2rem;
-                            margin: 1rem 0;
-                            color: var(--primary-color);
-                            font-weight: bold;
-                        ">
-                            {progress_percentage:.1f}% Complete
-                        </div>
-                """, unsafe_allow_html=True)
-                
-                # Display current level and next milestone
-                if current_level:
-                    st.markdown(f"""
-                        <div style="
-                            font-size: 1.4rem;
-                            margin: 1rem 0;
-                            color: var(--primary-color);
-                            font-weight: bold;
-                        ">
-                            Current Level: {current_level}
-                        </div>
-                    """, unsafe_allow_html=True)
-                
-                if next_milestone:
-                    threshold, level, icon = next_milestone
-                    remaining_percentage = threshold - progress_percentage
-                    st.markdown(f"""
-                        <div style="
-                            font-size: 1.1rem;
-                            margin: 0.5rem 0;
-                            color: var(--text-color);
-                            opacity: 0.8;
-                        ">
-                            Next Level: {level} {icon} ({remaining_percentage:.1f}% remaining)
-                        </div>
-                    """, unsafe_allow_html=True)
-                
-                st.markdown("</div>", unsafe_allow_html=True)
-                
-                estimated_time = estimate_time_to_goal(username, current_goal, df)
-                st.write(estimated_time)
+        with st.expander("Export to a file"):
+            export_tables = {"Weight Entries": "weight_entries", "Running Entries": "running_entries"}
+            export_col1, export_col2 = st.columns(2)
+            with export_col1:
+                export_label = st.selectbox("Data", list(export_tables), key="user_export_table")
+            with export_col2:
+                export_format = st.selectbox("Format", list(EXPORT_FORMATS), key="user_export_format")
+            if st.button("Prepare Export", key="user_export_btn", use_container_width=True):
+                export_download_button(export_tables[export_label], export_format, username=username)
 
-        # Data Management Section
-        st.markdown("""
-            <div class="section-container">
-                <h2>⚙️ Data Management</h2>
-        """, unsafe_allow_html=True)
+        st.markdown("</div>", unsafe_allow_html=True)
 
         # Delete Weight Entry Section
         st.markdown("""
@@ -1224,52 +1365,7 @@ def fitness_tracker(username):
                 <h3>🗑️ Delete Weight Entry</h3>
         """, unsafe_allow_html=True)
         
-        delete_date = st.date_input("Select date to delete entry", key="delete_date")
-        
-        if "confirm_delete_entry_state" not in st.session_state:
-            st.session_state.confirm_delete_entry_state = False
-            
-        if st.button("Delete Selected Entry", key="delete_entry_btn", use_container_width=True):
-            try:
-                # Convert delete_date to string format
-                delete_date_str = delete_date.strftime("%Y-%m-%d")
-                
-                # Convert df dates to datetime if they aren't already
-                if not df.empty:
-                    df["Date"] = pd.to_datetime(df["Date"])
-                    # Check if the date exists
-                    if any(df["Date"].dt.strftime("%Y-%m-%d") == delete_date_str):
-                        st.session_state.confirm_delete_entry_state = True
-                        st.warning(f"Are you sure you want to delete the entry for {delete_date.strftime('%d %B %Y')}?")
-                    else:
-                        st.warning("No entry found for the selected date.")
-                else:
-                    st.warning("No entries exist in your data.")
-            except Exception as e:
-                st.error(f"Error checking date: {str(e)}")
-                
-        if st.session_state.confirm_delete_entry_state:
-            col1, col2 = st.columns([1, 1])
-            with col1:
-                if st.button("Yes, Delete", key="confirm_delete_entry", use_container_width=True):
-                    try:
-                        delete_date_str = delete_date.strftime("%Y-%m-%d")
-                        # Convert dates to datetime for comparison
-                        df["Date"] = pd.to_datetime(df["Date"])
-                        # Filter out the selected date
-                        df = df[df["Date"].dt.strftime("%Y-%m-%d") != delete_date_str]
-                        if save_weight_entry(username, df, data_file):
-                            st.success(f"Entry for {delete_date.strftime('%d %B %Y')} deleted!")
-                            st.session_state.confirm_delete_entry_state = False
-                            time.sleep(1)
-                            st.rerun()
-                    except Exception as e:
-                        st.error(f"Error deleting entry: {str(e)}")
-                        st.session_state.confirm_delete_entry_state = False
-            with col2:
-                if st.button("Cancel", key="cancel_delete_entry", use_container_width=True):
-                    st.session_state.confirm_delete_entry_state = False
-                    st.rerun()
+        delete_entry_panel(username)
 
         # Delete All Data Section
         st.markdown("""
@@ -1291,22 +1387,15 @@ def fitness_tracker(username):
             with col1:
                 if st.button("Yes, Delete All", key="confirm_delete_all_btn", use_container_width=True):
                     try:
-                        # Create empty DataFrame
-                        empty_df = pd.DataFrame(columns=["Date", "Weight"])
-                        
-                        # Ensure the data file exists and is writable
-                        data_file = get_user_file(username)
-                        empty_df.to_csv(data_file, index=False)
-                        
-                        # Also delete goal weight file if it exists
-                        goal_file = get_goal_weight_file(username)
-                        if os.path.exists(goal_file):
-                            os.remove(goal_file)
-                            
-                        st.success("✅ All data has been deleted successfully!")
-                        st.session_state.confirm_delete_all = False
-                        time.sleep(1)
-                        st.rerun()
+                        # Delete weight entries and goal weight
+                        if db.clear_weight_data(username):
+                            st.success("✅ All data has been deleted successfully!")
+                            st.session_state.confirm_delete_all = False
+                            time.sleep(1)
+                            st.rerun()
+                        else:
+                            st.error("Failed to delete data. Please try again.")
+                            st.session_state.confirm_delete_all = False
                     except Exception as e:
                         st.error(f"Error deleting data: {str(e)}")
                         st.session_state.confirm_delete_all = False
@@ -1318,36 +1407,10 @@ def fitness_tracker(username):
         st.markdown("</div>", unsafe_allow_html=True)
     
     with col_img:
-        goggins_img = load_goggins_image(is_login=False)
+        goggins_img = load_goggins_image(is_login=False, width=300)
         if goggins_img:
             st.image(goggins_img, width=300, caption="STAY HARD!")
 
-def save_weight_entry(username, df, data_file):
-    """
-    Save weight entry with proper error handling.
-    """
-    try:
-        # Ensure the DataFrame has the correct columns
-        if "Date" not in df.columns or "Weight" not in df.columns:
-            st.error("Invalid data format")
-            return False
-            
-        # Convert Date column to datetime if it's not already
-        df["Date"] = pd.to_datetime(df["Date"])
-        
-        # Sort by date
-        df = df.sort_values("Date")
-        
-        # Round weight to 2 decimal places
-        df["Weight"] = df["Weight"].round(2)
-        
-        # Save to CSV
-        df.to_csv(data_file, index=False)
-        return True
-    except Exception as e:
-        st.error(f"Error saving weight data: {str(e)}")
-        return False
-
 def health_dashboard_page(username):
     """
     Display and handle the health dashboard functionality.
@@ -1368,21 +1431,14 @@ def health_dashboard_page(username):
         st.rerun()
     
     # Load user data
-    data_file = get_user_file(username)
     try:
-        df = pd.read_csv(data_file)
-        current_weight = df["Weight"].iloc[-1] if not df.empty else None
+        current_weight = db.get_latest_weight(username)
     except:
         current_weight = None
     
-    # Load or get height
-    height_file = f"height_{username}.txt"
+    # Load height
     try:
-        if os.path.exists(height_file):
-            with open(height_file, "r") as f:
-                height = float(f.read().strip())
-        else:
-            height = None
+        height = db.get_height(username)
     except:
         height = None
     
@@ -1405,8 +1461,7 @@ def health_dashboard_page(username):
                                          key="initial_height")
         with col2:
             if st.button("Save Height", key="save_height_btn", use_container_width=True):
-                with open(height_file, "w") as f:
-                    f.write(str(int(height_input)))
+                db.set_height(username, int(height_input))
                 st.success("✅ Height saved successfully!")
                 time.sleep(1)
                 st.rerun()
@@ -1424,8 +1479,7 @@ def health_dashboard_page(username):
                                        key="update_height")
         with col3:
             if st.button("Update", key="update_height_btn", use_container_width=True):
-                with open(height_file, "w") as f:
-                    f.write(str(int(new_height)))
+                db.set_height(username, int(new_height))
                 st.success("✅ Height updated successfully!")
                 time.sleep(1)
                 st.rerun()
@@ -2000,21 +2054,14 @@ def calorie_calculator_page(username):
         st.rerun()
     
     # Load user data
-    data_file = get_user_file(username)
     try:
-        df = pd.read_csv(data_file)
-        current_weight = df["Weight"].iloc[-1] if not df.empty else None
+        current_weight = db.get_latest_weight(username)
     except:
         current_weight = None
     
-    # Load or get height
-    height_file = f"height_{username}.txt"
+    # Load height
     try:
-        if os.path.exists(height_file):
-            with open(height_file, "r") as f:
-                height = float(f.read().strip())
-        else:
-            height = None
+        height = db.get_height(username)
     except:
         height = None
     
@@ -2198,6 +2245,8 @@ def calorie_calculator_page(username):
                     """, unsafe_allow_html=True)
                     
                     # Add progress visualization
+                    import matplotlib.pyplot as plt
+                    
                     fig, ax = plt.subplots(figsize=(10, 6))
                     plt.style.use('dark_background')
                     
@@ -2335,7 +2384,8 @@ def get_weekly_averages(username):
     """
     Calculate weekly averages for the user's weight data.
     Weeks start on Monday and end on Sunday.
-    Current week average is calculated dynamically based on entries up to current day.
+    Averages come from the weekly rollups the database keeps up to date on
+    every write, so no entries are read here.
     
     Args:
         username (str): Username to get data for
@@ -2344,55 +2394,17 @@ def get_weekly_averages(username):
         dict: Dictionary containing current and previous week's averages
     """
     try:
-        # Load data from CSV
-        data_file = get_user_file(username)
-        if not os.path.exists(data_file):
-            return {"current_week_avg": None, "previous_week_avg": None}
-        
-        # Read the CSV file and ensure it's not empty
-        df = pd.read_csv(data_file)
-        if df.empty:
-            return {"current_week_avg": None, "previous_week_avg": None}
-        
-        # Convert Date column to datetime
-        df['Date'] = pd.to_datetime(df['Date'])
-        
         # Get today's date and calculate week boundaries
         today = pd.Timestamp.now().normalize()  # Get today's date without time
         current_week_start = today - pd.Timedelta(days=today.weekday())  # Monday of current week
         previous_week_start = current_week_start - pd.Timedelta(weeks=1)  # Monday of previous week
-        previous_week_end = current_week_start - pd.Timedelta(days=1)  # Sunday of previous week
-        
-        # Debug prints
-        print(f"Today: {today}")
-        print(f"Current week start: {current_week_start}")
-        print(f"Previous week start: {previous_week_start}")
-        print(f"Previous week end: {previous_week_end}")
-        
-        # Get current week's data (from Monday to today)
-        current_week_data = df[
-            (df['Date'] >= current_week_start) & 
-            (df['Date'] <= today)
-        ]
-        
-        # Get previous week's data (from Monday to Sunday)
-        previous_week_data = df[
-            (df['Date'] >= previous_week_start) & 
-            (df['Date'] <= previous_week_end)
-        ]
-        
-        # Debug prints
-        print(f"Current week data:\n{current_week_data}")
-        print(f"Previous week data:\n{previous_week_data}")
-        
-        # Calculate averages
-        current_week_avg = None if current_week_data.empty else current_week_data['Weight'].mean()
-        previous_week_avg = None if previous_week_data.empty else previous_week_data['Weight'].mean()
-        
-        # Round averages to 2 decimal places if they exist
+        
+        rollups = db.get_weight_rollups(username, "week", previous_week_start, current_week_start)
+        averages = dict(zip(rollups["period_start"], rollups["mean"].round(2)))
+        
         return {
-            "current_week_avg": round(current_week_avg, 2) if current_week_avg is not None else None,
-            "previous_week_avg": round(previous_week_avg, 2) if previous_week_avg is not None else None
+            "current_week_avg": averages.get(current_week_start.strftime("%Y-%m-%d")),
+            "previous_week_avg": averages.get(previous_week_start.strftime("%Y-%m-%d"))
         }
         
     except Exception as e:
@@ -2402,6 +2414,8 @@ def get_weekly_averages(username):
 def calculate_trend_analysis(username):
     """
     Calculate trend analysis including regression line for weight data.
+    The regression comes from running sums the database updates on every
+    write, so nothing is fitted here.
     
     Args:
         username (str): Username to analyze data for
@@ -2410,43 +2424,25 @@ def calculate_trend_analysis(username):
         dict: Dictionary containing trend analysis data and regression parameters
     """
     try:
-        # Load data from CSV
-        data_file = get_user_file(username)
-        if not os.path.exists(data_file):
-            return None
-        
-        df = pd.read_csv(data_file)
+        # Load data from the database
+        df = load_weight_data(username)
         if df.empty:
             return None
         
-        # Convert Date column to datetime
-        df['Date'] = pd.to_datetime(df['Date'])
-        
-        # Create numeric X values (days since start)
-        df['Days'] = (df['Date'] - df['Date'].min()).dt.days
-        
-        # Calculate regression line
-        X = df['Days'].values.reshape(-1, 1)
-        y = df['Weight'].values
-        
-        from sklearn.linear_model import LinearRegression
-        reg = LinearRegression().fit(X, y)
-        
-        # Generate trend line points
-        trend_line = reg.predict(X)
-        
-        # Calculate R-squared
-        r_squared = reg.score(X, y)
+        trend = db.get_weight_trend(username)
+        if trend is None:
+            return None
         
-        # Calculate daily weight change rate
-        daily_change = reg.coef_[0]
+        # Generate trend line points (x is days since TREND_EPOCH)
+        days = (df['Date'] - pd.Timestamp(TREND_EPOCH)).dt.days
+        trend_line = (trend['intercept'] + trend['daily_change'] * days).values
         
         return {
             'dates': df['Date'],
             'weights': df['Weight'],
             'trend_line': trend_line,
-            'r_squared': r_squared,
-            'daily_change': daily_change
+            'r_squared': trend['r_squared'],
+            'daily_change': trend['daily_change']
         }
     except Exception as e:
         print(f"Error in trend analysis: {str(e)}")
@@ -2515,68 +2511,8 @@ def data_nerds_page(username):
         trend_data = calculate_trend_analysis(username)
         
         if trend_data is not None:
-            # Create interactive plot using plotly
-            import plotly.graph_objects as go
-            from plotly.subplots import make_subplots
-            
-            fig = make_subplots(specs=[[{"secondary_y": False}]])
-            
-            # Add actual weight data
-            fig.add_trace(
-                go.Scatter(
-                    x=trend_data['dates'],
-                    y=trend_data['weights'],
-                    mode='markers+lines',
-                    name='Weight',
-                    line=dict(color='#00B4D8', width=2),
-                    marker=dict(size=8),
-                    hovertemplate="Date: %{x}<br>Weight: %{y:.2f} kg<extra></extra>"
-                )
-            )
-            
-            # Add trend line
-            fig.add_trace(
-                go.Scatter(
-                    x=trend_data['dates'],
-                    y=trend_data['trend_line'],
-                    mode='lines',
-                    name='Trend',
-                    line=dict(color='#FFB700', width=2, dash='dash'),
-                    hovertemplate="Date: %{x}<br>Trend: %{y:.2f} kg<extra></extra>"
-                )
-            )
-            
-            # Update layout
-            fig.update_layout(
-                title={
-                    'text': "Weight Trend Analysis",
-                    'y':0.95,
-                    'x':0.5,
-                    'xanchor': 'center',
-                    'yanchor': 'top'
-                },
-                plot_bgcolor='rgba(10,25,47,0.1)',
-                paper_bgcolor='rgba(10,25,47,0)',
-                font=dict(color='#E6F1FF'),
-                xaxis=dict(
-                    title="Date",
-                    gridcolor='rgba(35,53,84,0.5)',
-                    showgrid=True
-                ),
-                yaxis=dict(
-                    title="Weight (kg)",
-                    gridcolor='rgba(35,53,84,0.5)',
-                    showgrid=True
-                ),
-                hovermode='x unified',
-                showlegend=True,
-                legend=dict(
-                    yanchor="top",
-                    y=0.99,
-                    xanchor="left",
-                    x=0.01
-                )
-            )
+            # Reuse the figure until the data or theme changes
+            fig = cached_figure(username, "trend", lambda: build_trend_figure(trend_data))
             
             # Display the plot
             st.plotly_chart(fig, use_container_width=True)
@@ -2656,8 +2592,8 @@ def data_nerds_page(username):
             - Example: -0.1 kg/day means you're losing 0.1 kg per day on average
             
             #### 4. Data Processing Steps 🔄
-            1. Convert dates to numeric values (days since first measurement)
-            2. Apply scikit-learn's LinearRegression model to calculate trend
+            1. Convert dates to numeric values (days since a fixed start date)
+            2. Keep running sums (n, Σx, Σy, Σxy, Σx², Σy²) that update with every entry, and solve the least-squares line from them
             3. Generate trend line points for visualization
             4. Calculate confidence metrics (R²)
             
@@ -2692,7 +2628,7 @@ def data_nerds_page(username):
 
 def get_weight_entries(username):
     """
-    Load weight entries for a given username from their data file.
+    Load weight entries for a given username from the database.
     
     Args:
         username (str): Username to get entries for
@@ -2701,18 +2637,193 @@ def get_weight_entries(username):
         list: List of dictionaries containing date and weight entries
     """
     try:
-        data_file = get_user_file(username)
-        if os.path.exists(data_file):
-            df = pd.read_csv(data_file)
-            df["Date"] = pd.to_datetime(df["Date"])
-            entries = [{"date": row["Date"], "weight": row["Weight"]} 
-                      for _, row in df.iterrows()]
-            return entries
-        return []
+        df = load_weight_data(username)
+        entries = [{"date": row["Date"], "weight": row["Weight"]} 
+                  for _, row in df.iterrows()]
+        return entries
     except Exception as e:
         st.error(f"Error loading weight entries: {str(e)}")
         return []
 
+def export_download_button(table, format_label, username=None):
+    """
+    Stream an export to a temporary file and offer it for download.
+    
+    Rows are written straight from a database cursor in chunks. Only
+    the given user's rows are read when username is set.
+    
+    Args:
+        table (str): Table name from Database.EXPORT_TABLES
+        format_label (str): Key of EXPORT_FORMATS
+        username (str): Export only this user's rows; None exports everyone
+    """
+    fmt, extension, mime = EXPORT_FORMATS[format_label]
+    fd, export_path = tempfile.mkstemp(suffix=f".{extension}")
+    os.close(fd)
+    try:
+        rows = db.export_data(export_path, table, fmt, username=username)
+        if rows is None:
+            st.error("Failed to export data. Please try again.")
+            return
+        prefix = username or "fitness_tracker"
+        with open(export_path, "rb") as export_file:
+            st.download_button(
+                label=f"Download {rows:,} rows",
+                data=export_file,
+                file_name=f"{prefix}_{table}.{extension}",
+                mime=mime,
+                key=f"download_{table}_{fmt}"
+            )
+    finally:
+        os.remove(export_path)
+
+def admin_panel():
+    """
+    Backup management, data export and import, and performance timings.
+    
+    Only rendered for the users in ADMIN_USERS.
+    """
+    st.header("Admin Panel")
+    
+    # Backup Management
+    st.subheader("Backup Management")
+    col1, col2 = st.columns(2)
+    
+    with col1:
+        if st.button("Create Backup"):
+            if db.create_backup():
+                st.success("Backup created successfully!")
+                db.cleanup_old_backups()
+            else:
+                st.error("Failed to create backup")
+    
+    with col2:
+        backup_files = db.get_backup_files()
+        if backup_files:
+            selected_backup = st.selectbox("Select backup to restore", backup_files)
+            if "confirm_restore_backup" not in st.session_state:
+                st.session_state.confirm_restore_backup = None
+            
+            if st.session_state.confirm_restore_backup is None:
+                if st.button("Restore Selected Backup"):
+                    st.session_state.confirm_restore_backup = selected_backup
+                    st.rerun()
+            else:
+                pending_backup = st.session_state.confirm_restore_backup
+                st.warning(f"⚠️ Restoring {pending_backup} overwrites every user's data and "
+                           "accounts. Are you sure?")
+                if st.button("Yes, Restore", key="confirm_restore_btn", use_container_width=True):
+                    st.session_state.confirm_restore_backup = None
+                    if db.restore_backup(pending_backup):
+                        st.success("Backup restored successfully!")
+                        st.rerun()
+                    else:
+                        st.error("Failed to restore backup")
+                if st.button("No, Cancel", key="cancel_restore_btn", use_container_width=True):
+                    st.session_state.confirm_restore_backup = None
+                    st.rerun()
+        else:
+            st.info("No backups available")
+    
+    # Data Recovery
+    st.subheader("Data Recovery")
+    col1, col2 = st.columns(2)
+    with col1:
+        admin_export_table = st.selectbox("Table", list(Database.EXPORT_TABLES), key="admin_export_table")
+    with col2:
+        admin_export_format = st.selectbox("Format", list(EXPORT_FORMATS), key="admin_export_format")
+    if st.button("Export Table"):
+        export_download_button(admin_export_table, admin_export_format)
+
+    if st.button("Export Database"):
+        try:
+            # Consistent snapshot, including pages still in the WAL, with the
+            # accounts and their passwords left out
+            snapshot_file = os.path.join(tempfile.gettempdir(), f"fitness_tracker_export_{os.getpid()}.db")
+            db.export_database(snapshot_file)
+            try:
+                with open(snapshot_file, 'rb') as f:
+                    st.caption("User accounts and passwords are not included. Use a backup "
+                               "to recover them.")
+                    st.download_button(
+                        label="Download Database File",
+                        data=f,
+                        file_name="fitness_tracker_backup.db",
+                        mime="application/octet-stream"
+                    )
+            finally:
+                os.remove(snapshot_file)
+        except Exception as e:
+            st.error(f"Failed to export database: {e}")
+    
+    uploaded_file = st.file_uploader("Choose a database file to import", type=['db'],
+                                     key="admin_import_file")
+    if "confirm_import_database" not in st.session_state:
+        st.session_state.confirm_import_database = False
+    
+    if uploaded_file is None:
+        st.session_state.confirm_import_database = False
+    elif not st.session_state.confirm_import_database:
+        if st.button("Import Database"):
+            st.session_state.confirm_import_database = True
+            st.rerun()
+    else:
+        st.warning(f"⚠️ Importing {uploaded_file.name} overwrites every user's data and "
+                   "accounts. Are you sure?")
+        if st.button("Yes, Import", key="confirm_import_btn", use_container_width=True):
+            st.session_state.confirm_import_database = False
+            # Imported like a restore: the current data is backed up first and
+            # pages are copied into the live database, which stays open
+            import_file = os.path.join(tempfile.gettempdir(), f"fitness_tracker_import_{os.getpid()}.db")
+            try:
+                with open(import_file, 'wb') as f:
+                    f.write(uploaded_file.getvalue())
+                if db.restore_backup(import_file):
+                    st.success("Database imported successfully!")
+                    st.rerun()
+                else:
+                    st.error("Failed to import database")
+            finally:
+                os.remove(import_file)
+        if st.button("No, Cancel", key="cancel_import_btn", use_container_width=True):
+            st.session_state.confirm_import_database = False
+            st.rerun()
+
+    # Performance
+    st.subheader("Performance")
+    st.caption(f"Percentiles over the last {timings.stats()['samples']:,} timed calls")
+    for kind, label in [("page", "Pages"), ("fragment", "Page fragments"),
+                        ("query", "Database calls"), ("csv", "CSV reads"), ("backup", "Backups")]:
+        summary = timings.summary(kind)
+        if not summary.empty:
+            st.markdown(f"**{label}**")
+            st.dataframe(summary.drop(columns="kind"), hide_index=True)
+    if db.query_log is not None:
+        st.markdown(f"**SQL statements** (slower than {db.query_log.slow_ms:g} ms are logged "
+                    f"to `{db.query_log.log_file}`)")
+        st.dataframe(db.query_log.stats(), hide_index=True)
+    if st.button("Reset Timings"):
+        timings.clear()
+        if db.query_log is not None:
+            db.query_log.reset()
+        st.rerun()
+
+def admin_page(username):
+    """
+    Admin page, opened from the tracker's sidebar.
+    
+    Args:
+        username (str): Current user's username
+    """
+    if st.button("← Back to Main Page", key="back_to_main_btn", use_container_width=True):
+        st.session_state["show_admin_panel"] = False
+        st.rerun()
+    
+    if not is_admin(username):
+        st.error("The admin panel is only available to administrators.")
+        return
+    admin_panel()
+
 def main_page():
     username = st.session_state['username']
     
@@ -2731,9 +2842,7 @@ def main_page():
     st.subheader("Weight History")
     weight_history = db.get_weight_history(username)
     if not weight_history.empty:
-        fig = go.Figure()
-        fig.add_trace(go.Scatter(x=weight_history['date'], y=weight_history['weight'],
-                               mode='lines+markers', name='Weight'))
+        fig = cached_figure(username, "history", lambda: build_history_figure(weight_history))
         st.plotly_chart(fig)
         
         # Display weight table
@@ -2742,61 +2851,8 @@ def main_page():
         st.info("No weight entries yet. Start tracking your weight!")
     
     # Admin Section
-    if username == "admin":
-        st.header("Admin Panel")
-        
-        # Backup Management
-        st.subheader("Backup Management")
-        col1, col2 = st.columns(2)
-        
-        with col1:
-            if st.button("Create Backup"):
-                if db.create_backup():
-                    st.success("Backup created successfully!")
-                    db.cleanup_old_backups()
-                else:
-                    st.error("Failed to create backup")
-        
-        with col2:
-            backup_files = db.get_backup_files()
-            if backup_files:
-                selected_backup = st.selectbox("Select backup to restore", backup_files)
-                if st.button("Restore Selected Backup"):
-                    if st.warning("This will overwrite current data. Are you sure?"):
-                        backup_path = os.path.join(db.backup_dir, selected_backup)
-                        if db.restore_backup(backup_path):
-                            st.success("Backup restored successfully!")
-                            st.experimental_rerun()
-                        else:
-                            st.error("Failed to restore backup")
-            else:
-                st.info("No backups available")
-        
-        # Data Recovery
-        st.subheader("Data Recovery")
-        if st.button("Export Database"):
-            try:
-                with open(db.db_file, 'rb') as f:
-                    st.download_button(
-                        label="Download Database File",
-                        data=f,
-                        file_name="fitness_tracker_backup.db",
-                        mime="application/octet-stream"
-                    )
-            except Exception as e:
-                st.error(f"Failed to export database: {e}")
-        
-        if st.button("Import Database"):
-            uploaded_file = st.file_uploader("Choose a database file", type=['db'])
-            if uploaded_file is not None:
-                if st.warning("This will overwrite current data. Are you sure?"):
-                    try:
-                        with open(db.db_file, 'wb') as f:
-                            f.write(uploaded_file.getvalue())
-                        st.success("Database imported successfully!")
-                        st.experimental_rerun()
-                    except Exception as e:
-                        st.error(f"Failed to import database: {e}")
+    if is_admin(username):
+        admin_panel()
     
     # Rest of the existing code...
 
@@ -2805,6 +2861,9 @@ if __name__ == "__main__":
     # Initialize session state
     if "logged_in" not in st.session_state:
         st.session_state["logged_in"] = False
+    # A refresh or new tab starts a fresh session; resume it from the token
+    if not st.session_state["logged_in"]:
+        resume_session()
     if "show_signup" not in st.session_state:
         st.session_state["show_signup"] = False
     if "show_health_dashboard" not in st.session_state:
@@ -2815,19 +2874,25 @@ if __name__ == "__main__":
         st.session_state["show_calorie_calculator"] = False
     if "show_data_nerds" not in st.session_state:
         st.session_state["show_data_nerds"] = False
+    if "show_admin_panel" not in st.session_state:
+        st.session_state["show_admin_panel"] = False
 
     # Route to appropriate page
     if st.session_state["show_signup"]:
-        signup_page()
+        page, args = signup_page, ()
     elif st.session_state["show_health_dashboard"]:
-        health_dashboard_page(st.session_state["username"])
+        page, args = health_dashboard_page, (st.session_state["username"],)
     elif st.session_state["show_running_assistant"]:
-        running_assistant_page(st.session_state["username"])
+        page, args = running_assistant_page, (st.session_state["username"],)
     elif st.session_state["show_calorie_calculator"]:
-        calorie_calculator_page(st.session_state["username"])
+        page, args = calorie_calculator_page, (st.session_state["username"],)
     elif st.session_state["show_data_nerds"]:
-        data_nerds_page(st.session_state["username"])
+        page, args = data_nerds_page, (st.session_state["username"],)
+    elif st.session_state["show_admin_panel"]:
+        page, args = admin_page, (st.session_state["username"],)
     elif st.session_state["logged_in"]:
-        fitness_tracker(st.session_state["username"])
+        page, args = fitness_tracker, (st.session_state["username"],)
     else:
-        login_page()
+        page, args = login_page, ()
+    with timings.timer("page", page.__name__):
+        page(*args)
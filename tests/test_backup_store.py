@@ -0,0 +1,90 @@
+"""
+Retention policy and chunk garbage collection of the backup store.
+"""
+
+import os
+from datetime import datetime, timedelta
+
+import numpy as np
+
+import backup_store
+from backup_store import CHUNK_SIZE, BackupStore
+
+def test_select_retained_keeps_newest_per_hour_day_and_week():
+    newest = datetime(2024, 3, 10, 12, 30)  # A Sunday, the last day of ISO week 10
+    # Every half hour for three weeks, given out of order
+    snapshots = [(f'snap_{i}', newest - timedelta(minutes=30 * i)) for i in range(3 * 7 * 48)]
+    snapshots.reverse()
+
+    keep = BackupStore.select_retained(snapshots, hourly=3, daily=2, weekly=2)
+
+    ids = {created_at: snapshot_id for snapshot_id, created_at in snapshots}
+    assert keep == {
+        # Newest in each of the last three hours
+        ids[datetime(2024, 3, 10, 12, 30)],
+        ids[datetime(2024, 3, 10, 11, 30)],
+        ids[datetime(2024, 3, 10, 10, 30)],
+        # Newest on each of the last two days
+        ids[datetime(2024, 3, 9, 23, 30)],
+        # Newest in each of the last two ISO weeks
+        ids[datetime(2024, 3, 3, 23, 30)],
+    }
+
+def test_select_retained_always_keeps_the_newest():
+    assert BackupStore.select_retained([], hourly=0, daily=0, weekly=0) == set()
+    snapshots = [('old', datetime(2024, 1, 1)), ('new', datetime(2024, 1, 2))]
+    assert BackupStore.select_retained(snapshots, hourly=0, daily=0, weekly=0) == {'new'}
+
+class FakeClock:
+    """Stands in for backup_store.datetime so snapshots get chosen timestamps"""
+    def __init__(self):
+        self.current = None
+
+    def now(self):
+        return self.current
+
+    @staticmethod
+    def fromisoformat(text):
+        return datetime.fromisoformat(text)
+
+def chunk_files(store):
+    return {name for _, _, names in os.walk(store.chunk_dir) for name in names}
+
+def test_retention_keeps_surviving_snapshots_restorable(tmp_path, monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(backup_store, 'datetime', clock)
+    store = BackupStore(str(tmp_path / 'backups'))
+    rng = np.random.default_rng(0)
+
+    # A file of eight chunks, two of which change before each hourly snapshot,
+    # so snapshots share most chunks and each one adds a few of its own
+    content = bytearray(rng.bytes(8 * CHUNK_SIZE))
+    source = str(tmp_path / 'source.db')
+    saved = {}
+    start = datetime(2024, 3, 1)
+    for hour in range(72):
+        for chunk in rng.choice(8, size=2, replace=False):
+            offset = int(chunk) * CHUNK_SIZE + int(rng.integers(CHUNK_SIZE - 16))
+            content[offset:offset + 16] = rng.bytes(16)
+        with open(source, 'wb') as f:
+            f.write(content)
+        clock.current = start + timedelta(hours=hour)
+        manifest = store.save(source)
+        saved[manifest['id']] = bytes(content)
+
+    chunks_before = chunk_files(store)
+    removed = store.apply_retention(hourly=6, daily=2, weekly=1)
+
+    survivors = store.list_snapshots()
+    assert removed == len(saved) - len(survivors) > 0
+    # Only chunks some surviving manifest still refers to are left
+    referenced = {digest + '.z' for snapshot_id in survivors
+                  for digest in store.load_manifest(snapshot_id)['chunks']}
+    assert chunk_files(store) == referenced
+    assert chunk_files(store) < chunks_before
+
+    for snapshot_id in survivors:
+        dest = str(tmp_path / 'restored.db')
+        store.restore(snapshot_id, dest)
+        with open(dest, 'rb') as f:
+            assert f.read() == saved[snapshot_id]
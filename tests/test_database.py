@@ -0,0 +1,170 @@
+"""
+Checks that the trigger-maintained weight rollups and trend statistics agree
+with pandas and numpy computed from scratch, after any mix of writes.
+"""
+
+import sqlite3
+from datetime import date, timedelta
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from database import TREND_EPOCH, Database
+
+USERS = ('alice', 'bob')
+FIRST_DAY = date(2024, 1, 1)
+DAYS = 120
+
+@pytest.fixture
+def db(tmp_path):
+    database = Database(str(tmp_path / 'test.db'), backup_dir=str(tmp_path / 'backups'))
+    for username in USERS:
+        database.add_user(username, 'secret')
+    yield database
+    database.backups.flush()
+    database.pool.close_all()
+
+def random_day(rng):
+    return (FIRST_DAY + timedelta(days=int(rng.integers(DAYS)))).isoformat()
+
+def random_weight(rng):
+    # Two decimals, as the trend statistics work in hundredths of a kg
+    return round(float(rng.uniform(60, 100)), 2)
+
+def apply_random_writes(db, expected, rng, count):
+    """Upsert and delete random entries in db and in the expected dict alike"""
+    for _ in range(count):
+        username = USERS[int(rng.integers(len(USERS)))]
+        entries = expected.setdefault(username, {})
+        action = rng.random()
+        if action < 0.5:
+            day, weight = random_day(rng), random_weight(rng)
+            assert db.add_weight_entry(username, day, weight)
+            entries[day] = weight
+        elif action < 0.75:
+            batch = [(username, random_day(rng), random_weight(rng)) for _ in range(5)]
+            assert db.add_weight_entries(batch) is not None
+            for _, day, weight in batch:
+                entries[day] = weight
+        elif entries:
+            # Deleting an existing entry, often a bucket's min or max
+            day = sorted(entries)[int(rng.integers(len(entries)))]
+            assert db.delete_weight_entry(username, day)
+            del entries[day]
+
+def reference_rollups(entries, period):
+    frame = pd.DataFrame({'date': pd.to_datetime(list(entries)),
+                          'weight': list(entries.values())})
+    freq = 'W-SUN' if period == 'week' else 'M'
+    frame['period_start'] = frame['date'].dt.to_period(freq).dt.start_time.dt.strftime('%Y-%m-%d')
+    grouped = frame.groupby('period_start')['weight']
+    result = pd.DataFrame({'count': grouped.count(), 'mean': grouped.mean(),
+                           'min': grouped.min(), 'max': grouped.max(),
+                           'std': grouped.std(ddof=0)})
+    return result.reset_index()
+
+def assert_matches_reference(db, expected):
+    for username in USERS:
+        entries = expected.get(username, {})
+        for period in ('week', 'month'):
+            rollups = db.get_weight_rollups(username, period)
+            if not entries:
+                assert rollups.empty
+                continue
+            reference = reference_rollups(entries, period)
+            assert list(rollups['period_start']) == list(reference['period_start'])
+            assert list(rollups['count']) == list(reference['count'])
+            for column in ('mean', 'min', 'max'):
+                np.testing.assert_allclose(rollups[column], reference[column], atol=1e-6)
+            # The variance comes from running float sums of squares, so a
+            # single-entry bucket can be left a hair above zero. Comparing
+            # variances keeps that from being amplified by the square root.
+            np.testing.assert_allclose(rollups['std'] ** 2, reference['std'] ** 2, atol=1e-8)
+
+        trend = db.get_weight_trend(username)
+        if not entries:
+            assert trend is None
+            continue
+        assert trend['n'] == len(entries)
+        if len(entries) < 2:
+            continue
+        days = [(date.fromisoformat(day) - date.fromisoformat(TREND_EPOCH)).days
+                for day in entries]
+        weights = list(entries.values())
+        slope, intercept = np.polyfit(days, weights, 1)
+        assert trend['daily_change'] == pytest.approx(slope, abs=1e-9)
+        assert trend['intercept'] == pytest.approx(intercept, abs=1e-6)
+        assert trend['r_squared'] == pytest.approx(np.corrcoef(days, weights)[0, 1] ** 2,
+                                                   abs=1e-9)
+
+def test_aggregates_follow_random_upserts_and_deletes(db):
+    rng = np.random.default_rng(1)
+    expected = {}
+    apply_random_writes(db, expected, rng, 400)
+    assert_matches_reference(db, expected)
+
+def test_aggregates_after_clear_weight_data(db):
+    rng = np.random.default_rng(2)
+    expected = {}
+    apply_random_writes(db, expected, rng, 200)
+    assert db.clear_weight_data('alice')
+    expected['alice'] = {}
+    assert_matches_reference(db, expected)
+
+    apply_random_writes(db, expected, rng, 100)
+    assert_matches_reference(db, expected)
+
+def test_aggregates_follow_date_changes(db):
+    rng = np.random.default_rng(3)
+    expected = {}
+    apply_random_writes(db, expected, rng, 100)
+    # The app only upserts, but the update trigger covers any column change
+    entries = expected['bob']
+    old_day = sorted(entries)[0]
+    new_day = (FIRST_DAY - timedelta(days=40)).isoformat()
+    with db.connection() as conn:
+        conn.execute('UPDATE weight_entries SET date = ? WHERE username = ? AND date = ?',
+                     (new_day, 'bob', old_day))
+        conn.commit()
+    entries[new_day] = entries.pop(old_day)
+    assert_matches_reference(db, expected)
+
+def test_restoring_a_legacy_database_rebuilds_aggregates(db, tmp_path):
+    # A database from before the rollup and trend migrations: the original
+    # tables only, at schema version 0
+    rng = np.random.default_rng(4)
+    legacy_entries = {}
+    for _ in range(150):
+        legacy_entries[random_day(rng)] = random_weight(rng)
+    legacy_file = str(tmp_path / 'legacy.db')
+    legacy = sqlite3.connect(legacy_file)
+    legacy.executescript('''
+        CREATE TABLE users (username TEXT PRIMARY KEY, password TEXT NOT NULL,
+                            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP);
+        CREATE TABLE weight_entries (id INTEGER PRIMARY KEY AUTOINCREMENT, username TEXT,
+                                     date DATE, weight REAL, UNIQUE(username, date));
+        CREATE TABLE goals (username TEXT PRIMARY KEY, target_weight REAL, target_date DATE);
+        CREATE TABLE running_entries (id INTEGER PRIMARY KEY AUTOINCREMENT, username TEXT,
+                                      date DATE, distance REAL, duration INTEGER,
+                                      heart_rate INTEGER);
+        CREATE TABLE profiles (username TEXT PRIMARY KEY, height REAL);
+    ''')
+    legacy.executemany('INSERT INTO users (username, password) VALUES (?, ?)',
+                       [(username, 'secret') for username in USERS])
+    legacy.executemany('INSERT INTO weight_entries (username, date, weight) VALUES (?, ?, ?)',
+                       [('alice', day, weight) for day, weight in legacy_entries.items()])
+    legacy.commit()
+    legacy.close()
+
+    # Data in the live database that the restore replaces
+    expected = {}
+    apply_random_writes(db, expected, rng, 50)
+
+    assert db.restore_backup(legacy_file)
+    expected = {'alice': legacy_entries, 'bob': {}}
+    assert_matches_reference(db, expected)
+
+    # The re-applied triggers keep the restored aggregates current
+    apply_random_writes(db, expected, rng, 100)
+    assert_matches_reference(db, expected)
@@ -0,0 +1,85 @@
+"""
+Chunked exports in every format read back to the rows in the database.
+"""
+
+import io
+import math
+
+import pandas as pd
+import pytest
+
+from database import Database
+
+CHUNK_ROWS = 4
+
+@pytest.fixture
+def db(tmp_path):
+    database = Database(str(tmp_path / 'test.db'), backup_dir=str(tmp_path / 'backups'))
+    for i in range(10):
+        username = f'user_{i:02d}'
+        database.add_user(username, 'secret')
+        # Early chunks hold no heart rate, target date or fractional values
+        # in the nullable and float columns; later ones do
+        late = i >= 5
+        database.add_running_entry(username, f'2024-01-{i + 1:02d}', 5.5 if late else 5,
+                                   1500 + i, 150 + i if late else None)
+        database.set_goal(username, 70.5 if late else 70, f'2024-06-{i + 1:02d}' if late else None)
+        database.set_height(username, 180)
+        database.add_weight_entry(username, '2024-01-01', 80 + i / 4)
+    yield database
+    database.backups.flush()
+    database.pool.close_all()
+
+def read_back(data, fmt):
+    if fmt == 'csv':
+        return pd.read_csv(io.BytesIO(data), dtype={'date': str, 'target_date': str})
+    if fmt == 'jsonl':
+        return pd.read_json(io.BytesIO(data), lines=True, dtype=False)
+    return pd.read_parquet(io.BytesIO(data))
+
+def same(value, expected):
+    if expected is None:
+        return value is None or (isinstance(value, float) and math.isnan(value))
+    return value == expected
+
+@pytest.mark.parametrize('fmt', Database.EXPORT_FORMATS)
+@pytest.mark.parametrize('table', list(Database.EXPORT_TABLES))
+def test_export_round_trip(db, table, fmt):
+    if fmt == 'parquet':
+        pytest.importorskip('pyarrow')
+    expected = [row for rows in db.iter_export_rows(table) for row in rows]
+    assert len(expected) == 10
+
+    out = io.BytesIO()
+    assert db.export_data(out, table, fmt, chunk_rows=CHUNK_ROWS) == len(expected)
+
+    frame = read_back(out.getvalue(), fmt)
+    columns = Database.EXPORT_TABLES[table]
+    assert list(frame.columns) == columns
+    assert len(frame) == len(expected)
+    for row, expected_row in zip(frame.itertuples(index=False), expected):
+        for column, value, expected_value in zip(columns, row, expected_row):
+            assert same(value, expected_value), (column, value, expected_value)
+
+def test_parquet_uses_the_column_types_even_without_rows(db):
+    pq = pytest.importorskip('pyarrow.parquet')
+    out = io.BytesIO()
+    assert db.export_data(out, 'running_entries', 'parquet', username='nobody') == 0
+    schema = pq.read_schema(io.BytesIO(out.getvalue()))
+    assert {field.name: str(field.type) for field in schema} == {
+        'username': 'string', 'date': 'string', 'distance': 'double',
+        'duration': 'int64', 'heart_rate': 'int64'}
+
+def test_database_export_leaves_out_credentials(db, tmp_path):
+    db.add_user('carol', 'hunter2-do-not-leak')
+    dest = str(tmp_path / 'export.db')
+    db.export_database(dest)
+
+    with open(dest, 'rb') as f:
+        assert b'hunter2-do-not-leak' not in f.read()
+    exported = Database(dest, backup_dir=str(tmp_path / 'export_backups'))
+    try:
+        assert not exported.user_exists('carol')
+        assert len(exported.get_weight_history('user_00')) == 1
+    finally:
+        exported.pool.close_all()
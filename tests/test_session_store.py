@@ -0,0 +1,138 @@
+"""
+Session tokens: signature checks, expiry, eviction, revocation, and the
+single-use rotation the app applies when it resumes a session from the URL.
+"""
+
+import os
+
+import pytest
+
+import session_store
+from database import Database
+from session_store import SessionStore
+
+APP_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                        'streamlit_app.py')
+
+class FakeClock:
+    """Stands in for session_store.time so tests can move past the TTL"""
+    def __init__(self, now=1_700_000_000.0):
+        self.now = now
+
+    def time(self):
+        return self.now
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeClock()
+    monkeypatch.setattr(session_store, 'time', fake)
+    return fake
+
+def test_token_resolves_to_its_user(clock):
+    store = SessionStore(secret='test-secret')
+    token = store.create('alice')
+    assert store.resolve(token) == 'alice'
+    assert store.resolve(token) == 'alice'
+
+def test_forged_and_tampered_tokens_are_rejected(clock):
+    store = SessionStore(secret='test-secret')
+    token = store.create('alice')
+    session_id, expires, signature = token.split('.')
+
+    flipped = signature[:-1] + ('0' if signature[-1] != '0' else '1')
+    assert store.resolve(f'{session_id}.{expires}.{flipped}') is None
+    # A later expiry under the old signature
+    assert store.resolve(f'{session_id}.{int(expires) + 3600}.{signature}') is None
+    # The right shape, signed with another secret
+    other = SessionStore(secret='other-secret')
+    assert store.resolve(f'{session_id}.{expires}.{other._sign(session_id, int(expires))}') is None
+    for malformed in ('', 'abc', 'a.b', 'a.notanumber.c', 'a.1.b.c', None):
+        assert store.resolve(malformed) is None
+    # None of that touched the real session
+    assert store.resolve(token) == 'alice'
+
+def test_expired_token_is_rejected_and_dropped(clock):
+    store = SessionStore(secret='test-secret', ttl=3600)
+    token = store.create('alice')
+    clock.now += 3599
+    assert store.resolve(token) == 'alice'
+    clock.now += 1
+    assert store.resolve(token) is None
+    assert store.stats()['sessions'] == 0
+
+def test_oldest_sessions_are_evicted_at_max_sessions(clock):
+    store = SessionStore(secret='test-secret', max_sessions=3)
+    tokens = []
+    for i in range(5):
+        tokens.append(store.create(f'user_{i}'))
+        clock.now += 1
+    assert store.stats()['sessions'] == 3
+    assert [store.resolve(token) for token in tokens] == [None, None, 'user_2', 'user_3', 'user_4']
+
+def test_expired_sessions_are_evicted_on_create(clock):
+    store = SessionStore(secret='test-secret', ttl=60)
+    store.create('alice')
+    store.create('bob')
+    clock.now += 61
+    store.create('carol')
+    assert store.stats()['sessions'] == 1
+
+def test_revoke_ends_only_that_session(clock):
+    store = SessionStore(secret='test-secret')
+    first, second = store.create('alice'), store.create('alice')
+    store.revoke(first)
+    assert store.resolve(first) is None
+    assert store.resolve(second) == 'alice'
+
+def test_revoke_user_leaves_other_users_alone(clock):
+    store = SessionStore(secret='test-secret')
+    alice_tokens = [store.create('alice') for _ in range(3)]
+    bob_token = store.create('bob')
+    store.revoke_user('alice')
+    assert all(store.resolve(token) is None for token in alice_tokens)
+    assert store.resolve(bob_token) == 'bob'
+
+def test_resuming_a_session_rotates_its_token(tmp_path, monkeypatch):
+    testing = pytest.importorskip('streamlit.testing.v1')
+    # The app opens its database and backups relative to the working directory
+    monkeypatch.chdir(tmp_path)
+
+    def open_app(token=None):
+        at = testing.AppTest.from_file(APP_FILE, default_timeout=60)
+        if token is not None:
+            at.query_params['session'] = token
+        at.run()
+        assert not at.exception, at.exception
+        return at
+
+    def url_token(at):
+        token = at.query_params.get('session')
+        return token[0] if isinstance(token, list) else token
+
+    # Created up front, so the app itself never writes and leaves no
+    # backup pending for after the working directory is restored
+    database = Database('fitness_tracker.db')
+    database.add_user('resume_user', 'secret1')
+    database.backups.flush()
+    database.pool.close_all()
+
+    at = open_app()
+    at.text_input(key='username_input').input('resume_user')
+    at.text_input(key='password_input').input('secret1')
+    [button for button in at.button if button.label == 'Login'][0].click().run()
+    first = url_token(at)
+    assert at.session_state['logged_in'] and first
+
+    # A refresh resumes the session and swaps the token in the URL
+    resumed = open_app(first)
+    assert resumed.session_state['logged_in']
+    assert resumed.session_state['username'] == 'resume_user'
+    second = url_token(resumed)
+    assert second and second != first
+
+    # The old token, e.g. from a copied link or history, no longer works
+    replayed = open_app(first)
+    assert not replayed.session_state['logged_in']
+    assert url_token(replayed) is None
+
+    assert open_app(second).session_state['logged_in']
@@ -0,0 +1,120 @@
+"""
+Lightweight timing instrumentation for pages and their fragments, database
+calls, CSV reads and backups.
+
+Each timed call appends (kind, name, milliseconds) to a bounded ring buffer,
+so recording costs two clock reads and an append and memory stays flat no
+matter how long the server runs. Percentiles are only computed when someone
+looks at them, from whatever samples are still in the buffer.
+"""
+
+import functools
+import inspect
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+
+class TimingLog:
+    def __init__(self, max_samples=20000):
+        self._samples = deque(maxlen=max_samples)  # (kind, name, elapsed_ms)
+        self._lock = threading.Lock()
+        # Callables(kind, name, elapsed_ms) told about every sample, e.g.
+        # the metrics exporter's histograms
+        self.observers = []
+
+    def record(self, kind, name, elapsed_ms):
+        with self._lock:
+            self._samples.append((kind, name, elapsed_ms))
+        for observer in self.observers:
+            observer(kind, name, elapsed_ms)
+
+    @contextmanager
+    def timer(self, kind, name):
+        """Time the with-block, including when it exits with an exception"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(kind, name, (time.perf_counter() - started) * 1000)
+
+    def iterate(self, kind, name, iterable):
+        """Yield from iterable, timing how long each item took to produce"""
+        iterator = iter(iterable)
+        while True:
+            started = time.perf_counter()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+            finally:
+                self.record(kind, name, (time.perf_counter() - started) * 1000)
+            yield item
+
+    def summary(self, kind=None):
+        """
+        Per-name latency percentiles over the samples in the buffer.
+
+        Args:
+            kind (str, optional): Only summarize samples of this kind
+
+        Returns:
+            pd.DataFrame: kind, name, calls, p50/p95/p99/max and total
+                          milliseconds, slowest total first
+        """
+        with self._lock:
+            samples = list(self._samples)
+        groups = {}
+        for sample_kind, name, elapsed_ms in samples:
+            if kind is None or sample_kind == kind:
+                groups.setdefault((sample_kind, name), []).append(elapsed_ms)
+
+        rows = []
+        for (sample_kind, name), values in groups.items():
+            p50, p95, p99 = np.percentile(values, [50, 95, 99])
+            rows.append({'kind': sample_kind, 'name': name, 'calls': len(values),
+                         'p50_ms': p50, 'p95_ms': p95, 'p99_ms': p99,
+                         'max_ms': max(values), 'total_ms': sum(values)})
+        columns = ['kind', 'name', 'calls', 'p50_ms', 'p95_ms', 'p99_ms', 'max_ms', 'total_ms']
+        df = pd.DataFrame(rows, columns=columns)
+        return df.sort_values('total_ms', ascending=False, ignore_index=True).round(2)
+
+    def clear(self):
+        with self._lock:
+            self._samples.clear()
+
+    def stats(self):
+        with self._lock:
+            return {'samples': len(self._samples), 'capacity': self._samples.maxlen}
+
+# Shared by every session and Database in the process
+timings = TimingLog()
+
+def timed_methods(kind, exclude=()):
+    """
+    Class decorator that times every public method under its own name.
+
+    Static and class methods, generator methods (whose work happens after
+    they return) and names in exclude are left alone.
+    """
+    def decorate(cls):
+        for name, member in list(vars(cls).items()):
+            if (name.startswith('_') or name in exclude or not inspect.isfunction(member)
+                    or inspect.isgeneratorfunction(member)):
+                continue
+            setattr(cls, name, _timed(kind, name, member))
+        return cls
+    return decorate
+
+def _timed(kind, name, func):
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            timings.record(kind, name, (time.perf_counter() - started) * 1000)
+    return wrapper